@@ -0,0 +1,442 @@
+"""Memory-mapped binary archive of closed sessions.
+
+All integers and floats are little-endian and every section starts on an
+8-byte boundary:
+
+    header     magic (with the format version), journal sequence, and the
+               offset and count of each section
+    names      UTF-8 application names and their uint64 end offsets
+    sessions   fixed-width session records, in the original order
+    entries    app ids (uint32) and seconds (float64), sliced by sessions
+               and by days
+    dates      int32 date ordinals of the day records (the date index)
+    days       fixed-width per-day totals, sorted by date
+    extras     JSON of session fields without a fixed column (timeline,
+               titles, ...)
+    settings   JSON of the other top-level entries of the data file
+
+Range statistics binary-search the date index and sum only the entries of
+the matching days, straight from the mapping; sessions are only decoded
+when iterated (export, migration, compaction).
+"""
+
+import bisect
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+
+from storage import AppTable, DailyRollup, SessionJournal, merge_aggregates
+
+MAGIC = b"PTARCH\x00\x01"
+# magic, journal_seq, then (offset, count) of names, sessions, entries,
+# dates, days, and (offset, length) of extras and of the settings JSON
+_HEADER = struct.Struct("<8sQ" + "QQ" * 7)
+# date ordinal (0 = none), start and end second of day (-1 = none), unused,
+# duration, first entry, entry count, extras offset, extras length, unused
+_SESSION = struct.Struct("<iiiidIIQII")
+# date ordinal (0 = undated), session count, duration, first entry, entry count
+_DAY = struct.Struct("<iIdII")
+_NO_TIME = -1
+_COLUMNS = ("date", "start_time", "end_time", "duration", "applications")
+# Extras key listing the columns a session did not have
+_MISSING = "_archive_missing"
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def _align(f):
+    padding = -f.tell() % 8
+    f.write(b"\0" * padding)
+    return f.tell()
+
+
+def _little_endian(values):
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def _date_ordinal(date_str):
+    try:
+        return datetime.date.fromisoformat(date_str).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def _seconds_of_day(time_str):
+    try:
+        hours, minutes, seconds = map(int, time_str.split(":"))
+    except (AttributeError, ValueError):
+        return None
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _time_str(seconds):
+    hours, remainder = divmod(seconds, 3600)
+    return f"{hours:02d}:{remainder // 60:02d}:{remainder % 60:02d}"
+
+
+def write_archive(path, sessions, settings=None, journal_seq=0):
+    """Writes ``sessions`` (any iterable of session dicts) atomically."""
+    apps = AppTable()
+    rollup = DailyRollup()
+    records = bytearray()
+    ids, seconds = array("I"), array("d")
+    extras = bytearray()
+    count = 0
+    for session in sessions:
+        rollup.add_session(session)
+        first = len(ids)
+        for app_raw_name, time_spent in session.get("applications", {}).items():
+            ids.append(apps.intern(app_raw_name))
+            seconds.append(time_spent)
+        ordinal = _date_ordinal(session.get("date"))
+        start = _seconds_of_day(session.get("start_time"))
+        end = _seconds_of_day(session.get("end_time"))
+        # Whatever has no fixed column, or does not round-trip through it,
+        # is kept verbatim as JSON.
+        extra = {key: value for key, value in session.items() if key not in _COLUMNS}
+        missing = [key for key in _COLUMNS if key not in session]
+        if missing:
+            extra[_MISSING] = missing
+        if "date" in session and (
+            ordinal is None
+            or datetime.date.fromordinal(ordinal).isoformat() != session["date"]
+        ):
+            extra["date"] = session["date"]
+        if "start_time" in session and (
+            start is None or _time_str(start) != session["start_time"]
+        ):
+            extra["start_time"] = session["start_time"]
+        if "end_time" in session and (
+            end is None or _time_str(end) != session["end_time"]
+        ):
+            extra["end_time"] = session["end_time"]
+        extra_offset = len(extras)
+        if extra:
+            extras += json.dumps(extra, separators=(",", ":"), default=dict).encode()
+        records += _SESSION.pack(
+            ordinal or 0,
+            _NO_TIME if start is None else start,
+            _NO_TIME if end is None else end,
+            0,
+            session.get("duration", 0),
+            first,
+            len(ids) - first,
+            extra_offset,
+            len(extras) - extra_offset,
+            0,
+        )
+        count += 1
+
+    dates, days = array("i"), bytearray()
+    day_list = [("", rollup.undated)] if rollup.undated["sessions"] else []
+    day_list += [(date_str, rollup.days[date_str]) for date_str in rollup.dates]
+    for date_str, day in day_list:
+        first = len(ids)
+        for app_raw_name, time_spent in day["applications"].items():
+            ids.append(apps.intern(app_raw_name))
+            seconds.append(time_spent)
+        ordinal = _date_ordinal(date_str) or 0
+        dates.append(ordinal)
+        days += _DAY.pack(
+            ordinal, day["sessions"], day["duration"], first, len(ids) - first
+        )
+    # A date string that is not ISO would sort out of place; the index must
+    # stay sorted for the binary search.
+    order = sorted(range(len(dates)), key=dates.__getitem__)
+    if order != list(range(len(dates))):
+        dates = array("i", (dates[i] for i in order))
+        days = b"".join(days[i * _DAY.size : (i + 1) * _DAY.size] for i in order)
+
+    names = [name.encode("utf-8") for name in apps.names]
+    name_ends = array("Q")
+    total = 0
+    for name in names:
+        total += len(name)
+        name_ends.append(total)
+    settings_json = json.dumps(settings or {}, default=dict).encode()
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        sections = []
+        sections.append((_align(f), len(names)))
+        f.write(_little_endian(name_ends).tobytes())
+        f.write(b"".join(names))
+        sections.append((_align(f), count))
+        f.write(records)
+        sections.append((_align(f), len(ids)))
+        f.write(_little_endian(ids).tobytes())
+        _align(f)
+        f.write(_little_endian(seconds).tobytes())
+        sections.append((_align(f), len(dates)))
+        f.write(_little_endian(dates).tobytes())
+        sections.append((_align(f), len(dates)))
+        f.write(days)
+        sections.append((_align(f), len(extras)))
+        f.write(extras)
+        sections.append((f.tell(), len(settings_json)))
+        f.write(settings_json)
+        f.seek(0)
+        f.write(
+            _HEADER.pack(
+                MAGIC,
+                journal_seq,
+                *(value for section in sections for value in section),
+            )
+        )
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SessionArchive:
+    """Read-only view of an archive file through ``mmap``."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._open()
+        except (struct.error, ValueError, TypeError) as e:
+            self.close()
+            raise ArchiveError(f"{path} is not a valid session archive: {e}") from None
+
+    def _open(self):
+        if sys.byteorder != "little":
+            raise ValueError("zero-copy reads need a little-endian machine")
+        if len(self._map) < _HEADER.size:
+            raise ValueError("file is too short")
+        header = _HEADER.unpack_from(self._map, 0)
+        if header[0] != MAGIC:
+            raise ValueError("bad magic")
+        self.journal_seq = header[1]
+        (
+            (names_at, n_names),
+            (self._sessions_at, self.session_count),
+            (entries_at, n_entries),
+            (dates_at, n_dates),
+            (self._days_at, _),
+            (self._extras_at, _),
+            (settings_at, settings_len),
+        ) = zip(header[2::2], header[3::2])
+        view = memoryview(self._map)
+        self._views = [view]
+        self._name_ends = self._cast(view, names_at, n_names, "Q")
+        self._names_at = names_at + 8 * n_names
+        self._names = [None] * n_names  # Decoded on first use
+        self._ids = self._cast(view, entries_at, n_entries, "I")
+        seconds_at = entries_at + (4 * n_entries + 7) // 8 * 8
+        self._seconds = self._cast(view, seconds_at, n_entries, "d")
+        self.dates = self._cast(view, dates_at, n_dates, "i")
+        if len(self._map) < settings_at + settings_len:
+            raise ValueError("file is truncated")
+        self.settings = json.loads(
+            self._map[settings_at : settings_at + settings_len] or b"{}"
+        )
+
+    def _cast(self, view, offset, count, typecode):
+        size = array(typecode).itemsize
+        if offset + size * count > len(self._map):
+            raise ValueError("file is truncated")
+        cast = view[offset : offset + size * count].cast("B").cast(typecode)
+        self._views.append(cast)
+        return cast
+
+    def close(self):
+        # Views into the mapping must be released before it can be closed
+        for view in reversed(getattr(self, "_views", [])):
+            view.release()
+        self._views = []
+        self._map.close()
+
+    def name(self, app_id):
+        name = self._names[app_id]
+        if name is None:
+            start = self._name_ends[app_id - 1] if app_id else 0
+            end = self._name_ends[app_id]
+            raw = self._map[self._names_at + start : self._names_at + end]
+            name = self._names[app_id] = raw.decode("utf-8")
+        return name
+
+    def _add_entries(self, apps, first, count):
+        ids, seconds, name = self._ids, self._seconds, self.name
+        for i in range(first, first + count):
+            app_raw_name = name(ids[i])
+            apps[app_raw_name] = apps.get(app_raw_name, 0) + seconds[i]
+
+    def aggregate(self, start_date=None, end_date=None):
+        # Same result as DailyRollup.aggregate over the archived sessions
+        if start_date is None and end_date is None:
+            lo, hi = 0, len(self.dates)
+        else:
+            start = 1 if start_date is None else _date_ordinal(start_date)
+            end = 2**31 - 1 if end_date is None else _date_ordinal(end_date)
+            lo = bisect.bisect_left(self.dates, start)
+            hi = bisect.bisect_right(self.dates, end)
+        apps, total_duration, session_count = {}, 0, 0
+        for i in range(lo, hi):
+            _, sessions, duration, first, count = _DAY.unpack_from(
+                self._map, self._days_at + i * _DAY.size
+            )
+            total_duration += duration
+            session_count += sessions
+            self._add_entries(apps, first, count)
+        return apps, total_duration, session_count
+
+    def session(self, index):
+        ordinal, start, end, _, duration, first, count, extra_at, extra_len, _ = (
+            _SESSION.unpack_from(self._map, self._sessions_at + index * _SESSION.size)
+        )
+        applications = {}
+        self._add_entries(applications, first, count)
+        session = {
+            "date": datetime.date.fromordinal(ordinal).isoformat() if ordinal else None,
+            "start_time": _time_str(start) if start != _NO_TIME else None,
+            "end_time": _time_str(end) if end != _NO_TIME else None,
+            "duration": duration,
+            "applications": applications,
+        }
+        if extra_len:
+            extra_at += self._extras_at
+            session.update(json.loads(self._map[extra_at : extra_at + extra_len]))
+            for key in session.pop(_MISSING, ()):
+                del session[key]
+        return session
+
+
+class ArchivedSessions(Sequence):
+    """``data["sessions"]`` of an ArchiveSessionStore.
+
+    Archived sessions are decoded from the mapping on access; sessions
+    appended since the last compaction are held as usual.
+    """
+
+    def __init__(self, archive, appended=()):
+        self.archive = archive
+        self.appended = list(appended)
+
+    def __len__(self):
+        return self.archive.session_count + len(self.appended)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        if index < self.archive.session_count:
+            return self.archive.session(index)
+        return self.appended[index - self.archive.session_count]
+
+    def __iter__(self):
+        for index in range(self.archive.session_count):
+            yield self.archive.session(index)
+        yield from self.appended
+
+    def append(self, session):
+        self.appended.append(session)
+
+
+class ArchiveSessionStore(SessionJournal):
+    """Binary archive as the snapshot, plus the usual JSON Lines journal.
+
+    Loading maps the archive and replays only the journal, so startup does
+    not depend on the size of the history. Range statistics combine the
+    archive's per-day totals with a rollup of the journaled sessions.
+    """
+
+    def __init__(self, archive_file, journal_file=None, compact_every=200):
+        super().__init__(
+            archive_file, journal_file or archive_file + ".journal", compact_every
+        )
+        self.archive = None
+
+    def load(self):
+        if self.archive is not None:
+            self.archive.close()
+        self.archive = SessionArchive(self.data_file)
+        self.apps = AppTable()
+        self.rollup = DailyRollup()  # Journaled sessions only
+        sessions = ArchivedSessions(self.archive)
+        self.last_seq = self.archive.journal_seq
+        self.pending = 0
+        for seq, session in self._read_journal():
+            if seq <= self.archive.journal_seq:
+                continue
+            session = self._decode_session(session)
+            sessions.append(session)
+            self.rollup.add_session(session)
+            self.last_seq = max(self.last_seq, seq)
+            self.pending += 1
+        self.data = dict(self.archive.settings, sessions=sessions)
+        return self.data
+
+    def compact(self, data):
+        settings = {key: value for key, value in data.items() if key != "sessions"}
+        write_archive(
+            self.data_file + ".new", data["sessions"], settings, self.last_seq
+        )
+        # The old mapping has to go before the file can be replaced (Windows)
+        if self.archive is not None:
+            self.archive.close()
+        os.replace(self.data_file + ".new", self.data_file)
+        self.archive = SessionArchive(self.data_file)
+        with open(self.journal_file, "w"):
+            pass
+        self.pending = 0
+        self.rollup = DailyRollup()
+        if isinstance(data["sessions"], ArchivedSessions):
+            data["sessions"].archive = self.archive
+            data["sessions"].appended = []
+        else:
+            data["sessions"] = ArchivedSessions(self.archive)
+        self.data = data
+
+    def rewrite(self, data):
+        self.compact(data)
+
+    def aggregate(self, start_date=None, end_date=None):
+        return merge_aggregates(
+            [
+                self.archive.aggregate(start_date, end_date),
+                self.rollup.aggregate(start_date, end_date),
+            ]
+        )
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+
+def convert_json_to_archive(json_file, archive_file):
+    # The JSON file (and its journal) are left untouched as a backup
+    data = SessionJournal(json_file).load()
+    settings = {key: value for key, value in data.items() if key != "sessions"}
+    write_archive(archive_file, data["sessions"], settings)
+    store = ArchiveSessionStore(archive_file)
+    return store, store.load()
+
+
+def convert_archive_to_json(archive_file, json_file):
+    # Includes sessions still in the archive's journal
+    store = ArchiveSessionStore(archive_file)
+    try:
+        data = store.load()
+        data["sessions"] = list(data["sessions"])
+    finally:
+        store.close()
+    SessionJournal(json_file).rewrite(data)
+    return data
@@ -0,0 +1,99 @@
+"""Collector throughput with many simulated agents on localhost.
+
+Each simulated agent holds one connection and sends batches of focus-change
+events, waiting for every ack like the real agent does. Reports events/s
+and batches/s for the whole fleet; with --persist, finished sessions are
+also written to per-device journals in a temporary directory.
+
+Run from the repository root:
+    python benchmarks/collector_bench.py [--agents 200] [--batches 20]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from remote import (  # noqa: E402
+    DeviceStoreSet,
+    RemoteCollector,
+    encode_frame,
+    read_frame,
+)
+
+
+async def run_agent(port, index, batches, events_per_batch):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    ts = 1_700_000_000.0
+    for seq in range(1, batches + 1):
+        events = []
+        if seq == 1:
+            events.append(["start", ts])
+        for i in range(events_per_batch):
+            ts += 3.0
+            events.append(["focus", ts, f"Document {i % 17} - Editor"])
+        if seq == batches:
+            events.append(["stop", ts + 1.0])
+        batch = {
+            "type": "batch",
+            "device": f"agent-{index:04d}",
+            "boot": "bench",
+            "seq": seq,
+            "events": events,
+        }
+        writer.write(encode_frame(batch))
+        await writer.drain()
+        ack = await read_frame(reader)
+        assert ack["seq"] == seq, ack
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_fleet(port, agents, batches, events_per_batch):
+    await asyncio.gather(
+        *(run_agent(port, i, batches, events_per_batch) for i in range(agents))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, default=200)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--events", type=int, default=50, help="events per batch")
+    parser.add_argument("--queue", type=int, default=1024, help="collector queue size")
+    parser.add_argument("--persist", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        sessions = [0]
+        stores = DeviceStoreSet(directory) if args.persist else None
+
+        def on_session(device, session):
+            sessions[0] += 1
+            if stores is not None:
+                stores.append(device, session)
+
+        collector = RemoteCollector(
+            port=0, on_session=on_session, queue_size=args.queue
+        )
+        collector.start()
+        started = time.perf_counter()
+        asyncio.run(run_fleet(collector.port, args.agents, args.batches, args.events))
+        elapsed = time.perf_counter() - started
+        collector.stop()
+
+    events = collector.events
+    print(
+        f"{args.agents} agents x {args.batches} batches: {events:,} events in "
+        f"{elapsed:.2f}s -> {events / elapsed:,.0f} events/s, "
+        f"{collector.batches / elapsed:,.0f} batches/s, {sessions[0]} sessions"
+        + (" (persisted)" if args.persist else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
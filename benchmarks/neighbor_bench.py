@@ -0,0 +1,88 @@
+"""Neighbor-table read cost per source.
+
+Compares reading /proc/net/arp directly with forking `arp -a`, and parsing
+the bundled fixtures, averaged over a number of scans. Also times the
+concurrent subnet sweep against loopback, which stands in for a /24.
+
+Run from the repository root:  python benchmarks/neighbor_bench.py [scans]
+"""
+
+import ipaddress
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from network import (  # noqa: E402
+    ArpCommandSource,
+    FixtureNeighborSource,
+    ProcNetArpSource,
+    sweep_hosts,
+)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def bench_source(label, make_source, scans):
+    started = time.perf_counter()
+    entries = 0
+    for _ in range(scans):
+        entries = sum(len(block) for _, block in make_source().blocks())
+    per_scan = (time.perf_counter() - started) / scans
+    print(f"{label:<28} {per_scan * 1000:8.3f} ms per scan ({entries} entries)")
+
+
+def bench_loopback_sweep(concurrency=256):
+    # Every probe goes to a listener on 127.0.0.1 so delivery can be checked;
+    # the second run covers a whole /24 of distinct loopback addresses.
+    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.settimeout(0.5)
+    port = listener.getsockname()[1]
+    received = [0]
+
+    def receive():
+        try:
+            while True:
+                listener.recvfrom(16)
+                received[0] += 1
+        except socket.timeout:
+            pass
+
+    receiver = threading.Thread(target=receive)
+    receiver.start()
+    started = time.perf_counter()
+    sent = sweep_hosts(["127.0.0.1"] * 254, port=port, concurrency=concurrency)
+    elapsed = time.perf_counter() - started
+    receiver.join()
+    listener.close()
+    print(
+        f"loopback sweep (same host)   {elapsed * 1000:8.1f} ms, "
+        f"{sent} sent, {received[0]} received"
+    )
+
+    hosts = list(ipaddress.ip_network("127.1.0.0/24").hosts())
+    started = time.perf_counter()
+    sent = sweep_hosts(hosts, concurrency=concurrency)
+    elapsed = time.perf_counter() - started
+    print(f"loopback sweep (/24)         {elapsed * 1000:8.1f} ms, {sent} sent")
+
+
+if __name__ == "__main__":
+    scans = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    if ProcNetArpSource.is_supported():
+        bench_source("/proc/net/arp", ProcNetArpSource, scans)
+    else:
+        print("/proc/net/arp: skipped (not available)")
+    if shutil.which("arp"):
+        bench_source("arp -a", ArpCommandSource, max(scans // 10, 1))
+    else:
+        print("arp -a: skipped (arp not in PATH)")
+    for name in ("arp_a.txt", "proc_net_arp.txt"):
+        path = os.path.join(FIXTURES, name)
+        bench_source(f"fixture {name}", lambda: FixtureNeighborSource(path), scans)
+    bench_loopback_sweep()
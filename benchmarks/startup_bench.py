@@ -0,0 +1,115 @@
+"""Startup-time benchmark.
+
+Measures, each in a fresh interpreter: importing main.py, importing
+matplotlib.pyplot (no longer done at startup), loading a synthetic history
+file, converting it to the binary archive and loading that, and - when a
+display is available - how long it takes until the window is up and the
+Start button is usable versus until history has been loaded in the
+background.
+
+Run from the repository root:  python benchmarks/startup_bench.py [sessions]
+"""
+
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def make_history(path, n_sessions, seed=3):
+    rng = random.Random(seed)
+    titles = [f"Window {i} - Application {i % 40}" for i in range(2_000)]
+    sessions = []
+    for i in range(n_sessions):
+        apps = {rng.choice(titles): rng.uniform(1, 900) for _ in range(12)}
+        sessions.append(
+            {
+                "date": f"2024-{1 + i * 12 // n_sessions:02d}-{1 + i % 28:02d}",
+                "start_time": "09:00:00",
+                "end_time": "10:00:00",
+                "duration": sum(apps.values()),
+                "applications": apps,
+            }
+        )
+    with open(path, "w") as f:
+        json.dump({"sessions": sessions}, f, indent=4)
+
+
+def run_timed(code, cwd):
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(REPO_ROOT))
+    prelude = "import time; _t0 = time.perf_counter()\n"
+    output = subprocess.run(
+        [sys.executable, "-c", prelude + code],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if output.returncode != 0:
+        return None, output.stderr.strip().splitlines()[-1]
+    return output.stdout.strip(), None
+
+
+def report(name, code, cwd):
+    result, error = run_timed(code, cwd)
+    print(f"{name:<38} {result if error is None else 'skipped: ' + error}")
+
+
+def main():
+    n_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    with tempfile.TemporaryDirectory() as cwd:
+        make_history(os.path.join(cwd, "productivity_data.json"), n_sessions)
+        size_mb = os.path.getsize(os.path.join(cwd, "productivity_data.json")) / 1e6
+        print(f"history: {n_sessions} sessions, {size_mb:.1f} MB\n")
+        elapsed = "print(f'{(time.perf_counter() - _t0) * 1000:.0f} ms')"
+        report("import main", "import main\n" + elapsed, cwd)
+        report("import matplotlib.pyplot", "import matplotlib.pyplot\n" + elapsed, cwd)
+        report(
+            "load history (SessionJournal.load)",
+            "from storage import SessionJournal\n"
+            "SessionJournal('productivity_data.json').load()\n" + elapsed,
+            cwd,
+        )
+        report(
+            "convert to binary archive",
+            "from archive import convert_json_to_archive\n"
+            "convert_json_to_archive('productivity_data.json', "
+            "'history.archive')[0].close()\n" + elapsed,
+            cwd,
+        )
+        report(
+            "load history (binary archive)",
+            "from archive import ArchiveSessionStore\n"
+            "ArchiveSessionStore('history.archive').load()\n" + elapsed,
+            cwd,
+        )
+        report(
+            "archive load + one month of stats",
+            "from archive import ArchiveSessionStore\n"
+            "store = ArchiveSessionStore('history.archive')\n"
+            "store.load()\n"
+            "store.aggregate('2024-06-01', '2024-06-30')\n" + elapsed,
+            cwd,
+        )
+        report(
+            "window usable / history loaded",
+            "import tkinter as tk\n"
+            "import main\n"
+            "root = tk.Tk()\n"
+            "app = main.ProductivityTracker(root)\n"
+            "root.update()\n"
+            "usable = time.perf_counter() - _t0\n"
+            "app._ensure_data_loaded()\n"
+            "loaded = time.perf_counter() - _t0\n"
+            "print(f'{usable * 1000:.0f} ms / {loaded * 1000:.0f} ms')\n"
+            "root.destroy()",
+            cwd,
+        )
+
+
+if __name__ == "__main__":
+    main()
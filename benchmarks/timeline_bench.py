@@ -0,0 +1,69 @@
+"""Event timeline size and query cost.
+
+Builds a synthetic day of focus intervals and reports the encoded size
+against a naive JSON list of events, plus the cost of per-day splitting and
+of the numpy hourly histogram versus a per-interval Python loop.
+
+Run from the repository root:  python benchmarks/timeline_bench.py [intervals]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from timeline import Timeline  # noqa: E402
+
+
+def make_timeline(n_intervals, seed=4):
+    rng = random.Random(seed)
+    apps = [f"Document {i} - Editor" for i in range(40)] + ["Inbox - Mail"]
+    start = time.time() - 86400
+    timeline = Timeline(start)
+    ts = start
+    for _ in range(n_intervals):
+        duration = rng.expovariate(1 / 45)
+        timeline.add(rng.choice(apps), ts, ts + duration)
+        ts += duration
+    timeline.end_ts = ts
+    return timeline
+
+
+def python_histogram(timeline):
+    bins = [0.0] * 24
+    for _, start_ts, end_ts in timeline.intervals():
+        while start_ts < end_ts:
+            next_hour = min(end_ts, (start_ts // 3600 + 1) * 3600)
+            bins[time.localtime(start_ts).tm_hour] += next_hour - start_ts
+            start_ts = next_hour
+    return bins
+
+
+def timed(label, func, repeat=5):
+    func()  # Warm-up, e.g. the first numpy import
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    print(f"{label:<32} {(time.perf_counter() - started) / repeat * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    n_intervals = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    timeline = make_timeline(n_intervals)
+    encoded = len(json.dumps(timeline.to_dict()))
+    naive = len(
+        json.dumps(
+            [[start, app, end - start] for app, start, end in timeline.intervals()]
+        )
+    )
+    print(
+        f"{len(timeline):,} intervals: {encoded / 1024:,.0f} KiB encoded "
+        f"vs {naive / 1024:,.0f} KiB as a JSON event list"
+    )
+    timed("totals", timeline.totals)
+    timed("split_by_day", timeline.split_by_day)
+    timed("hourly histogram (numpy)", timeline.hourly_histogram)
+    timed("hourly histogram (python)", lambda: python_histogram(timeline))
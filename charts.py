@@ -0,0 +1,137 @@
+import math
+
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+
+class _FigureView:
+    # One long-lived Figure + Tk canvas per view. Figures are created through
+    # matplotlib.figure.Figure rather than pyplot, so nothing accumulates in
+    # pyplot's global figure registry.
+
+    def __init__(self, master, figsize, dpi=None, bg=None):
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        self.widget = self.canvas.get_tk_widget()
+        if bg is not None:
+            self.figure.patch.set_facecolor(bg)
+            self.widget.configure(bg=bg)
+        self._last_data = None
+
+    def _unchanged(self, labels, sizes):
+        data = (tuple(labels), tuple(round(size, 1) for size in sizes))
+        if data == self._last_data:
+            return True
+        self._last_data = data
+        return False
+
+    def pack(self, **kwargs):
+        self.widget.pack(**kwargs)
+
+    def pack_forget(self):
+        self.widget.pack_forget()
+
+    def destroy(self):
+        self.widget.destroy()
+        self.figure.clear()
+
+
+class MiniBarChartView(_FigureView):
+    """Horizontal top-N bar chart for the public monitor, updated in place."""
+
+    def __init__(self, master, theme, top_n=3):
+        super().__init__(master, figsize=(2.8, 1.8), dpi=65, bg=theme["bg"])
+        self.top_n = top_n
+        ax = self.ax = self.figure.add_subplot(111)
+        ax.set_facecolor(theme["bg"])
+        positions = list(range(top_n))
+        self.bars = ax.barh(positions, [0] * top_n, color=theme["chart"], height=0.6)
+        ax.set_yticks(positions)
+        ax.set_yticklabels([""] * top_n)
+
+        ax.tick_params(axis="x", colors=theme["fg"], labelsize=6)
+        ax.tick_params(axis="y", colors=theme["fg"], labelsize=7)
+        ax.spines["top"].set_visible(False)
+        ax.spines["right"].set_visible(False)
+        ax.spines["bottom"].set_color(theme["fg"])
+        ax.spines["left"].set_color(theme["fg"])
+
+        ax.invert_yaxis()  # Top item first
+        ax.set_xlabel("Time (sec)", color=theme["fg"], fontsize=7)
+        self._labels = None
+
+    def update(self, labels, sizes):
+        if self._unchanged(labels, sizes):
+            return False
+        for index, bar in enumerate(self.bars):
+            visible = index < len(sizes)
+            bar.set_width(sizes[index] if visible else 0)
+            bar.set_visible(visible)
+        self.ax.set_xlim(0, max(sizes) * 1.05 if sizes else 1)
+        padded_labels = list(labels) + [""] * (self.top_n - len(labels))
+        if padded_labels != self._labels:
+            # Label widths drive the layout, so only re-run it when they change
+            self._labels = padded_labels
+            self.ax.set_yticklabels(padded_labels)
+            self.figure.tight_layout(pad=0.2)
+        self.canvas.draw_idle()
+        return True
+
+
+class PieChartView(_FigureView):
+    """Statistics tab pie chart; wedges and labels are moved, not rebuilt."""
+
+    START_ANGLE = 90
+    LABEL_DISTANCE = 1.1
+    PCT_DISTANCE = 0.85
+
+    def __init__(self, master, title="Top Applications Usage"):
+        super().__init__(master, figsize=(5, 4))
+        self.figure.subplots_adjust(
+            left=0.1, right=0.9, top=0.9, bottom=0.2
+        )  # Adjust as needed
+        self.ax = self.figure.add_subplot(111)
+        self.title = title
+        self.wedges, self.texts, self.autotexts = [], [], []
+
+    def _rebuild(self, labels, sizes):
+        self.ax.clear()
+        self.wedges, self.texts, self.autotexts = self.ax.pie(
+            sizes,
+            labels=labels,
+            autopct="%1.1f%%",
+            startangle=self.START_ANGLE,
+            pctdistance=self.PCT_DISTANCE,
+            labeldistance=self.LABEL_DISTANCE,
+        )
+        self.ax.axis("equal")
+        self.ax.set_title(self.title)
+
+    def update(self, labels, sizes):
+        if self._unchanged(labels, sizes):
+            return False
+        if len(sizes) != len(self.wedges):
+            # The number of slices changed; redraw the axes of the same figure.
+            self._rebuild(labels, sizes)
+            self.canvas.draw_idle()
+            return True
+
+        total = float(sum(sizes)) or 1.0
+        theta1 = self.START_ANGLE
+        for wedge, text, autotext, label, size in zip(
+            self.wedges, self.texts, self.autotexts, labels, sizes
+        ):
+            fraction = size / total
+            theta2 = theta1 + 360.0 * fraction
+            wedge.set_theta1(theta1)
+            wedge.set_theta2(theta2)
+            mid = math.radians((theta1 + theta2) / 2)
+            x, y = math.cos(mid), math.sin(mid)
+            text.set_position((self.LABEL_DISTANCE * x, self.LABEL_DISTANCE * y))
+            text.set_horizontalalignment("left" if x > 0 else "right")
+            text.set_text(label)
+            autotext.set_position((self.PCT_DISTANCE * x, self.PCT_DISTANCE * y))
+            autotext.set_text(f"{fraction * 100:.1f}%")
+            theta1 = theta2
+        self.canvas.draw_idle()
+        return True
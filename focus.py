@@ -0,0 +1,164 @@
+import datetime
+import functools
+import re
+import threading
+
+from timeline import session_days
+
+
+def parse_focus_keywords(keywords_str):
+    return [kw.strip().lower() for kw in keywords_str.split(",") if kw.strip()]
+
+
+class FocusClassifier:
+    """Decides whether a raw window title counts as productive.
+
+    The keywords are compiled once into a single case-insensitive alternation
+    and results are memoized per title in a bounded LRU, so a title seen on
+    every tick is only matched the first time.
+    """
+
+    def __init__(self, keywords=(), cache_size=4096):
+        self.keywords = list(keywords)
+        # Longest first so overlapping keywords prefer the most specific one.
+        ordered = sorted(set(self.keywords), key=len, reverse=True)
+        self._pattern = (
+            re.compile("|".join(re.escape(kw) for kw in ordered), re.IGNORECASE)
+            if ordered
+            else None
+        )
+        self._matches = functools.lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, app_raw_name):
+        return self._pattern.search(app_raw_name) is not None
+
+    def is_productive(self, app_raw_name):
+        if self._pattern is None:
+            return False
+        return self._matches(app_raw_name)
+
+    def productive_seconds(self, applications):
+        return sum(
+            seconds
+            for app_raw_name, seconds in applications.items()
+            if self.is_productive(app_raw_name)
+        )
+
+    def tag_sessions(self, sessions):
+        # Bulk tagging of history: (session, productive seconds) pairs.
+        for session in sessions:
+            yield session, self.productive_seconds(_raw_titles(session))
+
+
+def _raw_titles(session):
+    # Sessions only carry "titles" when applications are normalized names
+    return session.get("titles") or session.get("applications", {})
+
+
+def titles_on_date(sessions, date_str):
+    """(raw titles, share) of the sessions that have time on ``date_str``.
+
+    ``share`` is the part of a session's tracked time on that date; titles
+    are not split at midnight, so a session crossing it is prorated.
+    Sessions are walked from the newest and the walk stops at the first one
+    starting two days earlier.
+    """
+    day = datetime.date.fromisoformat(date_str)
+    earliest = (day - datetime.timedelta(days=1)).isoformat()
+    for i in range(len(sessions) - 1, -1, -1):
+        session = sessions[i]
+        start_date = session.get("date")
+        if not start_date or start_date > date_str:
+            continue
+        if start_date < earliest:
+            break
+        pieces = session_days(session)
+        if len(pieces) == 1:
+            if start_date == date_str:
+                yield _raw_titles(session), 1.0
+            continue
+        tracked = {date: sum(apps.values()) for date, apps, _ in pieces}
+        total = sum(tracked.values())
+        if tracked.get(date_str) and total:
+            yield _raw_titles(session), tracked[date_str] / total
+
+
+class ProductiveTimeCounter:
+    """Running "productive time today" used by the daily goal progress bar.
+
+    Totals for today's saved sessions are computed once and cached until a
+    session is saved, the keywords change or the date rolls over. The live
+    session is added incrementally by the tracking loop, so reading the
+    value costs the same no matter how many sessions exist today.
+    """
+
+    def __init__(self, store, keywords=(), sessions=None):
+        self.store = store
+        # Callable returning the session list; focus time is classified on
+        # the raw titles, which the stores' aggregates do not keep.
+        self.sessions = sessions
+        self.classifier = FocusClassifier(keywords)
+        self._lock = threading.Lock()
+        self._saved_date = None
+        self._saved_total = 0
+        self._saved_focus = 0
+        self._live_total = 0
+        self._live_focus = 0
+
+    def set_keywords(self, keywords, live_title_times):
+        classifier = FocusClassifier(keywords)
+        with self._lock:
+            self.classifier = classifier
+            self._saved_date = None
+            self._reset_live(live_title_times)
+
+    def reset_live(self, live_title_times=None):
+        with self._lock:
+            self._reset_live(live_title_times or {})
+
+    def _reset_live(self, live_title_times):
+        self._live_total = 0
+        self._live_focus = 0
+        for raw_title, seconds in live_title_times.items():
+            self._live_total += seconds
+            if self.classifier.is_productive(raw_title):
+                self._live_focus += seconds
+
+    def add_live(self, raw_title, seconds):
+        productive = self.classifier.is_productive(raw_title)
+        with self._lock:
+            self._live_total += seconds
+            if productive:
+                self._live_focus += seconds
+
+    def invalidate(self, store=None):
+        # Called once a session has been saved (its time moves from the live
+        # counters into the store) or the history was replaced.
+        with self._lock:
+            if store is not None:
+                self.store = store
+            self._saved_date = None
+            self._live_total = 0
+            self._live_focus = 0
+
+    def _refresh_saved(self, today_str):
+        apps, _, _ = self.store.aggregate(today_str, today_str)
+        self._saved_total = sum(apps.values())
+        if self.sessions is None or not self.classifier.keywords:
+            self._saved_focus = self.classifier.productive_seconds(apps)
+        else:
+            self._saved_focus = sum(
+                self.classifier.productive_seconds(titles) * share
+                for titles, share in titles_on_date(self.sessions(), today_str)
+            )
+        self._saved_date = today_str
+
+    def value(self, focus_mode):
+        today_str = datetime.datetime.now().strftime("%Y-%m-%d")
+        with self._lock:
+            if self._saved_date != today_str:
+                self._refresh_saved(today_str)
+            # If focus mode is off, or no keywords, all time is productive for goal
+            if focus_mode and self.classifier.keywords:
+                return self._saved_focus + self._live_focus
+            return self._saved_total + self._live_total
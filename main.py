@@ -8,21 +8,39 @@ import time
 import json
 import os
 import datetime
+import glob
 import threading
-import psutil
-from win32gui import GetForegroundWindow, GetWindowText
 
-# --- NEW IMPORTS ---
-import subprocess
-import re
-import win32process  # Added for getting process ID
-
-# --- END NEW IMPORTS ---
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+# network.py (subprocess/re), remote.py (asyncio) and matplotlib (charts.py)
+# are imported on first use so they are not paid for before the window appears.
+from archive import ArchiveSessionStore, convert_json_to_archive
+from focus import ProductiveTimeCounter, parse_focus_keywords
+from normalize import TitleNormalizer, TitleRuleError
+from storage import (
+    SessionCheckpoint,
+    SessionJournal,
+    lock_exclusive,
+    SqliteSessionStore,
+    import_json_to_sqlite,
+    make_session,
+    merge_aggregates,
+    write_json_atomic,
+)
+from timeline import Timeline
+from tracking import StateMailbox, TrackerEngine
+from widgets import CanvasBarChart, KeyedTreeview
 
 
 class ProductivityTracker:
+    UI_FRAME_MS = 250  # Refresh rate of the Tk-side tracking state poller
+    ARP_POLL_MS = 100  # How often streamed ARP scan results are drained
+    COLLECTOR_POLL_MS = 1000  # Refresh rate of the collector status line
+    COLLECTOR_ADDRESS = "0.0.0.0:8765"  # remote.DEFAULT_PORT on all interfaces
+    LOCAL_DEVICE = "This computer"
+    FLEET = "All devices"
+    ARP_SCAN_TIMEOUT = 15.0  # Seconds before a hung neighbor read is cancelled
+    CHECKPOINT_SECONDS = 10  # How often the live session is checkpointed
+
     def __init__(self, root):
         self.root = root
         self.root.title("Personal Productivity Tracker")
@@ -30,17 +48,55 @@ class ProductivityTracker:
         self.root.minsize(800, 650)
 
         self.data_file = "productivity_data.json"
-        if not os.path.exists(self.data_file):
+        self.db_file = "productivity_data.db"
+        self.archive_file = "productivity_data.archive"
+        self.live_file = "productivity_data.live"  # Checkpoint of the live session
+        self.remote_devices_dir = "remote_devices"
+        self.remote_stores = None  # remote.DeviceStoreSet, loaded on first use
+        self.rules_file = "title_rules.txt"
+        if not any(
+            os.path.exists(path)
+            for path in (self.data_file, self.db_file, self.archive_file)
+        ):
             with open(self.data_file, "w") as f:
                 json.dump({"sessions": []}, f)
 
-        self.load_data()
+        self.store = self._open_store()
+        # Only one instance owns the live checkpoint; a second one tracks
+        # without it rather than taking the first one's log as a crash.
+        self._live_lock = lock_exclusive(self.live_file + ".lock")
+        if self._live_lock is not None:
+            # Taken before the checkpoint writer exists, so starting to track
+            # while history loads cannot begin a new log over the old one.
+            self._unsaved_logs = self._take_live_checkpoint()
+            self.checkpoint = SessionCheckpoint(self.live_file)
+        else:
+            print("Another instance is running; the live session is not checkpointed")
+            self._unsaved_logs = []
+            self.checkpoint = None
+        self.recovered_session = None
+        self._start_data_load()
+        self.productive_counter = ProductiveTimeCounter(
+            self.store, sessions=lambda: self.data["sessions"]
+        )
+        self.ui_state = StateMailbox()
+        self.arp_worker = None
+        self._arp_refresh_id = None
+        self.collector = None
+        self.title_normalizer = self._load_title_normalizer()
+        self.tracker = TrackerEngine(
+            on_interval=self.productive_counter.add_live,
+            on_change=self._on_foreground_change,
+            on_error=self._on_tracking_error,
+            on_span=self._record_span,
+            normalizer=self.title_normalizer,
+        )
+        self.timeline = None  # Timeline of the live session, when enabled
 
         self.tracking = False
         self.start_time = None
         self.current_app = ""
         self.app_times = {}
-        self.tracking_thread = None
         self.public_monitor = None
         self.public_monitor_showing = False
         self.focus_mode = False
@@ -82,17 +138,117 @@ class ProductivityTracker:
         }
         self.create_ui()
 
+    def _open_store(self):
+        # The SQLite store is opt-in: it is used once a migration has created
+        # the database, otherwise the JSON file + journal stays the default.
+        if os.path.exists(self.db_file):
+            return SqliteSessionStore(self.db_file)
+        if os.path.exists(self.archive_file):
+            return ArchiveSessionStore(self.archive_file)
+        return SessionJournal(self.data_file)
+
+    def _load_title_normalizer(self):
+        try:
+            return TitleNormalizer.from_file(self.rules_file)
+        except (OSError, TitleRuleError) as e:
+            print(f"Ignoring {self.rules_file}, using the built-in rules: {e}")
+            return TitleNormalizer()
+
     def load_data(self):
+        # A damaged history is never replaced here: the JSON store skips what
+        # it cannot read and keeps a copy (see _report_damaged_history).
         try:
-            with open(self.data_file, "r") as f:
-                self.data = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+            self.data = self.store.load()
+        except FileNotFoundError:
             self.data = {"sessions": []}
             self.save_data()
 
+    def _start_data_load(self):
+        # History is parsed in the background while the window comes up;
+        # anything that reads it calls _ensure_data_loaded() first.
+        self._data_loaded = threading.Event()
+        self._data_load_error = None
+
+        def load():
+            try:
+                self.load_data()
+                self._save_recovered_sessions()
+            except Exception as e:
+                self._data_load_error = e
+            finally:
+                self._data_loaded.set()
+
+        threading.Thread(target=load, daemon=True).start()
+        self.root.after(200, self._report_damaged_history)
+
+    def _take_live_checkpoint(self):
+        # A checkpoint left behind means the app died while tracking. It is
+        # renamed aside and only removed once its session has been saved;
+        # earlier ones may remain if the app also died before that.
+        if os.path.exists(self.live_file):
+            try:
+                os.replace(self.live_file, f"{self.live_file}.{time.time_ns()}")
+            except OSError as e:
+                print(f"Cannot recover the unfinished session: {e}")
+        return sorted(glob.glob(f"{glob.escape(self.live_file)}.[0-9]*"))
+
+    def _save_recovered_sessions(self):
+        # Runs once history has loaded; each session is saved as it was at
+        # its last checkpoint.
+        for path in self._unsaved_logs:
+            session = SessionCheckpoint.recover(path)
+            if session is not None:
+                key = (session["date"], session["start_time"])
+                # Already saved if the crash came between saving and finish()
+                if not any(
+                    (s.get("date"), s.get("start_time")) == key
+                    for s in self.data["sessions"][-5:]
+                ):
+                    self.data["sessions"].append(session)
+                    self.store.append_session(session, self.data)
+                    self.recovered_session = session
+            os.remove(path)
+        self._unsaved_logs = []
+
+    def _report_damaged_history(self):
+        if not self._data_loaded.is_set():
+            self.root.after(200, self._report_damaged_history)
+            return
+        if self.recovered_session is not None and not self.tracking:
+            self.status_label.config(
+                text=f"Not tracking - recovered an unfinished session from "
+                f"{self.recovered_session['date']} "
+                f"{self.recovered_session['start_time']}"
+            )
+        problems = getattr(self.store, "load_problems", None)
+        if not problems:
+            return
+        details = "\n".join(problems[:5])
+        if len(problems) > 5:
+            details += f"\n... and {len(problems) - 5} more"
+        if self.store.read_only:
+            outcome = (
+                f"{self.data_file} was left unchanged, and new sessions are kept "
+                f"in {self.store.journal_file} until it is repaired."
+            )
+        else:
+            outcome = "The sessions that could be read were saved back."
+        messagebox.showwarning(
+            "History Partly Unreadable",
+            f"Some of your history could not be read and was skipped:\n\n"
+            f"{details}\n\nThe original file was kept as "
+            f"{self.store.damaged_copy} and the skipped sessions were saved "
+            f"to {self.store.quarantine_file}. {outcome}",
+        )
+
+    def _ensure_data_loaded(self):
+        self._data_loaded.wait()
+        if self._data_load_error is not None:
+            raise self._data_load_error
+
     def save_data(self):
-        with open(self.data_file, "w") as f:
-            json.dump(self.data, f, indent=4)
+        # Full rewrite (atomic); finished sessions go through append_session.
+        self.store.rewrite(self.data)
 
     def create_ui(self):
         self.notebook = ttk.Notebook(self.root)
@@ -109,9 +265,18 @@ class ProductivityTracker:
         self.notebook.add(self.settings_frame, text="Settings")
 
         self.setup_tracking_tab()
-        self.setup_stats_tab()
         self.setup_settings_tab()
-        self.setup_network_devices_tab()
+        # Statistics and Network Devices are built the first time they are shown
+        self._pending_tab_setup = {
+            str(self.stats_frame): self.setup_stats_tab,
+            str(self.network_devices_frame): self.setup_network_devices_tab,
+        }
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
+    def _on_tab_changed(self, event=None):
+        setup = self._pending_tab_setup.pop(self.notebook.select(), None)
+        if setup is not None:
+            setup()
 
     def setup_tracking_tab(self):
         status_frame = ttk.LabelFrame(self.tracking_frame, text="Tracking Status")
@@ -156,6 +321,7 @@ class ProductivityTracker:
             self.session_tree.column(col, width=100, anchor="w")
         self.session_tree.column("Time Spent", anchor="e")
         self.session_tree.pack(fill="both", expand=True, padx=5, pady=5)
+        self.session_tree_rows = KeyedTreeview(self.session_tree)
 
     def setup_stats_tab(self):
         date_frame = ttk.Frame(self.stats_frame)
@@ -168,6 +334,17 @@ class ProductivityTracker:
         )
         stats_dropdown.pack(side="left", padx=5)
         stats_dropdown.bind("<<ComboboxSelected>>", self.update_stats)
+        ttk.Label(date_frame, text="Device:").pack(side="left", padx=5)
+        self.stats_device_var = tk.StringVar(value=self.LOCAL_DEVICE)
+        self.stats_device_dropdown = ttk.Combobox(
+            date_frame,
+            textvariable=self.stats_device_var,
+            values=[self.LOCAL_DEVICE, self.FLEET],
+            state="readonly",
+            postcommand=self._refresh_device_choices,
+        )
+        self.stats_device_dropdown.pack(side="left", padx=5)
+        self.stats_device_dropdown.bind("<<ComboboxSelected>>", self.update_stats)
         ttk.Button(date_frame, text="Refresh", command=self.update_stats).pack(
             side="left", padx=5
         )
@@ -200,19 +377,37 @@ class ProductivityTracker:
         )
         idle_entry.pack(anchor="w", padx=10, pady=5)
         remote_device_frame = ttk.LabelFrame(
-            settings_inner_frame, text="Remote Device Monitoring (Conceptual)"
+            settings_inner_frame, text="Remote Device Monitoring"
         )
         remote_device_frame.pack(fill="x", padx=10, pady=10)
         ttk.Label(
-            remote_device_frame, text="Target Device IP Address (for future use):"
+            remote_device_frame, text="Collector listen address (host:port):"
+        ).pack(anchor="w", padx=10, pady=(5, 0))
+        self.collector_address_var = tk.StringVar(value=self.COLLECTOR_ADDRESS)
+        ttk.Entry(
+            remote_device_frame, textvariable=self.collector_address_var, width=30
+        ).pack(anchor="w", padx=10, pady=(0, 5))
+        ttk.Label(
+            remote_device_frame,
+            text="Only accept agents from IP address (leave empty for any):",
         ).pack(anchor="w", padx=10, pady=(5, 0))
         remote_ip_entry = ttk.Entry(
             remote_device_frame, textvariable=self.remote_device_ip_var, width=30
         )
         remote_ip_entry.pack(anchor="w", padx=10, pady=(0, 5))
+        collector_row = ttk.Frame(remote_device_frame)
+        collector_row.pack(fill="x", padx=10, pady=5)
+        self.collector_button = ttk.Button(
+            collector_row, text="Start Collector", command=self.toggle_collector
+        )
+        self.collector_button.pack(side="left")
+        self.collector_status_label = ttk.Label(collector_row, text="Not running")
+        self.collector_status_label.pack(side="left", padx=10)
         ttk.Label(
             remote_device_frame,
-            text="Note: Current tracking (win32gui) is LOCAL-ONLY.\nTrue remote application tracking requires an agent on the remote device\nand network communication. This field is a placeholder.",
+            text="Run 'python remote.py --host <this computer>' on each machine to "
+            "track it.\nAgents batch their focus changes and keep them on disk "
+            "while the collector is unreachable.",
             justify="left",
             font=("Arial", 8),
         ).pack(anchor="w", padx=10, pady=(0, 5))
@@ -261,6 +456,20 @@ class ProductivityTracker:
         )
         theme_dropdown.pack(anchor="w", padx=10, pady=5)
         theme_dropdown.bind("<<ComboboxSelected>>", self.update_monitor_theme)
+        ttk.Label(monitor_frame, text="Chart Renderer:").pack(
+            anchor="w", padx=10, pady=5
+        )
+        # "Canvas" draws the mini chart with plain Tk items and never loads
+        # matplotlib; "Matplotlib" keeps the original axes-based chart.
+        self.monitor_chart_var = tk.StringVar(value="Canvas")
+        chart_dropdown = ttk.Combobox(
+            monitor_frame,
+            textvariable=self.monitor_chart_var,
+            values=["Canvas", "Matplotlib"],
+            state="readonly",
+        )
+        chart_dropdown.pack(anchor="w", padx=10, pady=5)
+        chart_dropdown.bind("<<ComboboxSelected>>", self.update_monitor_theme)
         ttk.Label(monitor_frame, text="Daily Productivity Goal (hours):").pack(
             anchor="w", padx=10, pady=5
         )
@@ -283,6 +492,8 @@ class ProductivityTracker:
             monitor_frame, textvariable=self.focus_apps_var, width=40
         )
         focus_entry.pack(anchor="w", padx=10, pady=5)
+        self.focus_apps_var.trace_add("write", self._on_focus_keywords_changed)
+        self._on_focus_keywords_changed()
         data_frame = ttk.LabelFrame(settings_inner_frame, text="Data Management")
         data_frame.pack(fill="x", padx=10, pady=10)
         ttk.Button(data_frame, text="Export Data", command=self.export_data).pack(
@@ -291,6 +502,40 @@ class ProductivityTracker:
         ttk.Button(data_frame, text="Clear All Data", command=self.clear_data).pack(
             anchor="w", padx=10, pady=5
         )
+        self.normalize_titles_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            data_frame,
+            text="Group window titles into applications (e.g. all Chrome tabs "
+            "as Google Chrome)",
+            variable=self.normalize_titles_var,
+            command=self._on_normalize_titles_toggled,
+        ).pack(anchor="w", padx=10, pady=5)
+        ttk.Button(
+            data_frame, text="Edit Title Rules...", command=self.edit_title_rules
+        ).pack(anchor="w", padx=10, pady=5)
+        self.timeline_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            data_frame,
+            text="Record event timeline (when each app was used; splits sessions "
+            "exactly at midnight)",
+            variable=self.timeline_var,
+        ).pack(anchor="w", padx=10, pady=5)
+        # Both migrations start from the JSON file
+        migration_state = "normal" if type(self.store) is SessionJournal else "disabled"
+        self.migrate_sqlite_button = ttk.Button(
+            data_frame,
+            text="Migrate History to SQLite",
+            command=self.migrate_to_sqlite,
+            state=migration_state,
+        )
+        self.migrate_sqlite_button.pack(anchor="w", padx=10, pady=5)
+        self.convert_archive_button = ttk.Button(
+            data_frame,
+            text="Convert History to Binary Archive",
+            command=self.convert_to_archive,
+            state=migration_state,
+        )
+        self.convert_archive_button.pack(anchor="w", padx=10, pady=5)
         about_frame = ttk.LabelFrame(settings_inner_frame, text="About")
         about_frame.pack(fill="x", padx=10, pady=10)
         ttk.Label(about_frame, text="Personal Productivity Tracker v1.1").pack(
@@ -301,6 +546,8 @@ class ProductivityTracker:
         ).pack(anchor="w", padx=10, pady=5)
 
     def setup_network_devices_tab(self):
+        from network import NeighborDiff
+
         main_net_frame = ttk.Frame(self.network_devices_frame)
         main_net_frame.pack(expand=True, fill="both", padx=10, pady=10)
 
@@ -308,7 +555,8 @@ class ProductivityTracker:
             main_net_frame,
             text="This section displays devices found in your computer's ARP cache. "
             "These are typically devices your computer has recently communicated with on the local network. "
-            "The list is based on the 'arp -a' command output.",
+            "On Linux the list is read from /proc/net/arp; elsewhere it is based on "
+            "the 'arp -a' command output.",
             wraplength=750,
             justify="left",
         )
@@ -319,18 +567,49 @@ class ProductivityTracker:
 
         self.scan_button = ttk.Button(
             control_frame,
-            text="Show ARP Cache (arp -a)",
+            text="Show ARP Cache",
             command=self.scan_network_devices,
         )
         self.scan_button.pack(side="left")
 
+        self.cancel_scan_button = ttk.Button(
+            control_frame,
+            text="Cancel",
+            command=self.cancel_network_scan,
+            state="disabled",
+        )
+        self.cancel_scan_button.pack(side="left", padx=(5, 0))
+
+        self.arp_sweep_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            control_frame, text="Sweep subnet first", variable=self.arp_sweep_var
+        ).pack(side="left", padx=(10, 0))
+
         self.network_status_label = ttk.Label(control_frame, text="")
         self.network_status_label.pack(side="left", padx=10)
 
+        refresh_frame = ttk.Frame(main_net_frame)
+        refresh_frame.pack(fill="x", pady=(0, 10))
+        self.arp_auto_refresh_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            refresh_frame,
+            text="Auto-refresh every",
+            variable=self.arp_auto_refresh_var,
+            command=self._on_network_refresh_toggled,
+        ).pack(side="left")
+        self.arp_refresh_seconds_var = tk.StringVar(value="30")
+        ttk.Entry(
+            refresh_frame, textvariable=self.arp_refresh_seconds_var, width=5
+        ).pack(side="left", padx=5)
+        ttk.Label(
+            refresh_frame,
+            text="seconds (new devices are highlighted, gone ones greyed)",
+        ).pack(side="left")
+
         results_frame = ttk.LabelFrame(main_net_frame, text="ARP Cache Entries")
         results_frame.pack(fill="both", expand=True)
 
-        columns = ("Interface", "IP Address", "MAC Address", "Type")
+        columns = ("Interface", "IP Address", "MAC Address", "Type", "Status")
         self.arp_tree = ttk.Treeview(results_frame, columns=columns, show="headings")
         for col in columns:
             self.arp_tree.heading(col, text=col)
@@ -338,8 +617,14 @@ class ProductivityTracker:
                 self.arp_tree.column(col, width=150, anchor="w", minwidth=120)
             elif col == "Interface":
                 self.arp_tree.column(col, width=180, anchor="w", minwidth=150)
+            elif col == "Status":
+                self.arp_tree.column(col, width=70, anchor="w", minwidth=60)
             else:  # Type
                 self.arp_tree.column(col, width=100, anchor="w", minwidth=80)
+        self.arp_tree.tag_configure("new", background="#d9f2d0")
+        self.arp_tree.tag_configure("gone", foreground="#999999")
+        self.arp_tree_rows = KeyedTreeview(self.arp_tree)
+        self.arp_diff = NeighborDiff()
 
         arp_scrollbar_y = ttk.Scrollbar(
             results_frame, orient="vertical", command=self.arp_tree.yview
@@ -354,302 +639,357 @@ class ProductivityTracker:
         arp_scrollbar_x.pack(side="bottom", fill="x")
         self.arp_tree.pack(fill="both", expand=True, padx=5, pady=5)
 
-    def scan_network_devices(self):
+    def scan_network_devices(self, automatic=False):
+        from network import NeighborScanWorker, SubnetSweepSource
+
+        if self.arp_worker is not None:
+            return
         self.network_status_label.config(text="Loading ARP cache...")
         self.scan_button.config(state="disabled")
-        for item in self.arp_tree.get_children():
-            self.arp_tree.delete(item)
-        self.root.update_idletasks()
-
+        self.cancel_scan_button.config(state="normal")
+        self.arp_diff.start()
+        self.arp_scan_automatic = automatic
+        self.arp_scan_count = 0
+        self.arp_scan_interfaces = 0
+
+        source = SubnetSweepSource() if self.arp_sweep_var.get() else None
+        self.arp_worker = NeighborScanWorker(source, timeout=self.ARP_SCAN_TIMEOUT)
+        self.arp_worker.start()
+        self._poll_network_scan()
+
+    def cancel_network_scan(self):
+        if self.arp_worker is not None:
+            self.network_status_label.config(text="Cancelling scan...")
+            self.arp_worker.cancel()
+
+    def _poll_network_scan(self):
+        # Drains whatever the worker has produced since the last poll; rows
+        # for an interface appear as soon as its block has been parsed.
+        import queue
+
+        worker = self.arp_worker
+        if worker is None:
+            return
         try:
-            process = subprocess.run(
-                ["arp", "-a"],
-                capture_output=True,
-                text=True,
-                check=False,
-                encoding="utf-8",
-                errors="replace",
-            )
-
-            if process.returncode != 0 and process.stderr:
-                if not process.stdout.strip():
-                    self.network_status_label.config(
-                        text=f"Error running arp -a: {process.stderr.strip()}"
-                    )
-                    messagebox.showerror(
-                        "ARP Error",
-                        f"Failed to execute arp -a.\nError: {process.stderr.strip()}",
-                    )
+            while True:
+                event = worker.events.get_nowait()
+                if event[0] == "block":
+                    self._show_arp_block(event[1], event[2])
+                elif event[0] == "progress":
+                    self.network_status_label.config(text=event[1])
+                else:
+                    self._finish_network_scan(event)
                     return
+        except queue.Empty:
+            pass
+        self.root.after(self.ARP_POLL_MS, self._poll_network_scan)
 
-            arp_output = process.stdout
-            if not arp_output.strip():
-                self.network_status_label.config(text="No output from arp -a command.")
-                return
+    def _on_network_refresh_toggled(self):
+        if self.arp_auto_refresh_var.get() and self.arp_worker is None:
+            self.scan_network_devices(automatic=True)  # Reschedules when done
+        else:
+            self._schedule_network_refresh()
 
-            parsed_data = self._parse_arp_output(arp_output)
+    def _schedule_network_refresh(self):
+        if self._arp_refresh_id is not None:
+            self.root.after_cancel(self._arp_refresh_id)
+            self._arp_refresh_id = None
+        if not self.arp_auto_refresh_var.get():
+            return
+        try:
+            seconds = max(float(self.arp_refresh_seconds_var.get()), 1.0)
+        except ValueError:
+            seconds = 30.0
+        self._arp_refresh_id = self.root.after(
+            int(seconds * 1000), self._auto_refresh_network
+        )
 
-            if not parsed_data:
+    def _auto_refresh_network(self):
+        self._arp_refresh_id = None
+        if self.arp_worker is None:
+            self.scan_network_devices(automatic=True)
+        # A scan that is already running reschedules when it finishes
+
+    def _show_arp_block(self, interface, entries):
+        self.arp_diff.add(entries)
+        self.arp_tree_rows.update(self.arp_diff.rows())
+        self.arp_scan_count += len(entries)
+        self.arp_scan_interfaces += 1
+        self.network_status_label.config(
+            text=f"Scanning... {self.arp_scan_count} entries from "
+            f"{self.arp_scan_interfaces} interface(s) (last: {interface})"
+        )
+
+    def _finish_network_scan(self, event):
+        source_name = self.arp_worker.source.name
+        self.arp_worker = None
+        if self.scan_button.winfo_exists():
+            self.scan_button.config(state="normal")
+            self.cancel_scan_button.config(state="disabled")
+
+        kind = event[0]
+        if kind == "done":
+            self.arp_diff.finish()
+        else:
+            self.arp_diff.cancel()
+        self.arp_tree_rows.update(self.arp_diff.rows())
+
+        if kind == "done":
+            entry_count, had_output = event[1], event[2]
+            if not had_output:
+                self.network_status_label.config(text=f"No output from {source_name}.")
+            elif not entry_count and not self.arp_diff.gone:
                 self.network_status_label.config(
                     text="No devices found in ARP cache or parsing failed."
                 )
             else:
-                for entry in parsed_data:
-                    self.arp_tree.insert(
-                        "",
-                        "end",
-                        values=(
-                            entry["interface"],
-                            entry["ip"],
-                            entry["mac"],
-                            entry["type"],
-                        ),
-                    )
                 self.network_status_label.config(
-                    text=f"Scan complete. Found {len(parsed_data)} entries."
+                    text=f"Scan complete. Found {entry_count} entries "
+                    f"({len(self.arp_diff.new)} new, {len(self.arp_diff.gone)} gone)."
                 )
-
-        except FileNotFoundError:
-            self.network_status_label.config(text="Error: 'arp' command not found.")
-            messagebox.showerror(
-                "Command Error",
-                "'arp' command not found. Please ensure it is in your system's PATH.",
-            )
-        except Exception as e:
+        elif kind == "cancelled":
+            self.network_status_label.config(text="Scan cancelled.")
+        elif kind == "not_found":
+            self.network_status_label.config(text=f"Error: '{source_name}' not found.")
+            if not self.arp_scan_automatic:
+                messagebox.showerror(
+                    "Command Error",
+                    f"'{source_name}' not found. Please ensure the 'arp' command "
+                    "is in your system's PATH.",
+                )
+        else:
             self.network_status_label.config(
-                text=f"An unexpected error occurred: {str(e)}"
-            )
-            messagebox.showerror(
-                "Error", f"An unexpected error occurred during scan: {str(e)}"
+                text=f"Error reading {source_name}: {event[1]}"
             )
-        finally:
-            if hasattr(self, "scan_button") and self.scan_button.winfo_exists():
-                self.scan_button.config(state="normal")
-
-    def _parse_arp_output(self, arp_output_str):
-        entries = []
-        current_interface = "Unknown"
-        interface_re = re.compile(r"Interface:\s*([\d\.]+)\s*---.*", re.IGNORECASE)
-        lines = arp_output_str.splitlines()
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            match_interface = interface_re.match(line)
-            if match_interface:
-                current_interface = match_interface.group(1)
-                continue
-            if (
-                "internet address" in line.lower()
-                and "physical address" in line.lower()
-            ):
-                continue
-            parts = re.split(r"\s{2,}", line)
-            if len(parts) < 2:
-                parts = re.split(r"\s+", line)
-
-            if len(parts) >= 3:
-                ip_address, mac_address, entry_type = parts[0], parts[1], parts[2]
-                if re.match(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$", ip_address):
-                    entries.append(
-                        {
-                            "interface": current_interface,
-                            "ip": ip_address,
-                            "mac": mac_address,
-                            "type": entry_type,
-                        }
-                    )
-            elif len(parts) == 2:
-                ip_address, second_part = parts[0], parts[1]
-                if re.match(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$", ip_address):
-                    if (
-                        re.match(
-                            r"^([0-9A-Fa-f]{2}-){5}[0-9A-Fa-f]{2}$",
-                            second_part,
-                            re.IGNORECASE,
-                        )
-                        or second_part.lower() == "(incomplete)"
-                    ):
-                        entries.append(
-                            {
-                                "interface": current_interface,
-                                "ip": ip_address,
-                                "mac": second_part,
-                                "type": "(missing)",
-                            }
-                        )
-                    else:
-                        entries.append(
-                            {
-                                "interface": current_interface,
-                                "ip": ip_address,
-                                "mac": "(missing)",
-                                "type": second_part,
-                            }
-                        )
-        return entries
+            if not self.arp_scan_automatic:
+                messagebox.showerror(
+                    "ARP Error", f"Failed to read {source_name}.\nError: {event[1]}"
+                )
+        self._schedule_network_refresh()
+
+    def toggle_collector(self):
+        from remote import RemoteCollector
+
+        if self.collector is not None:
+            self.collector.stop()
+            self.collector = None
+            self.collector_button.config(text="Start Collector")
+            self.collector_status_label.config(text="Not running")
+            return
+
+        host, _, port = self.collector_address_var.get().strip().rpartition(":")
+        try:
+            port = int(port)
+        except ValueError:
+            messagebox.showerror("Collector", "Enter the listen address as host:port.")
+            return
+        try:
+            self._ensure_remote_stores()
+        except (OSError, json.JSONDecodeError) as e:
+            messagebox.showerror("Collector", f"Cannot load remote history: {e}")
+            return
+        allowed_ip = self.remote_device_ip_var.get().strip()
+        collector = RemoteCollector(
+            host or "0.0.0.0",
+            port,
+            on_session=self._on_remote_session,
+            allowed_hosts=[allowed_ip] if allowed_ip else (),
+        )
+        try:
+            collector.start()
+        except OSError as e:
+            messagebox.showerror("Collector", f"Cannot listen on {host}:{port}: {e}")
+            return
+        self.collector = collector
+        self.remote_session_count = 0
+        self._shown_remote_sessions = 0
+        self.collector_button.config(text="Stop Collector")
+        self._poll_collector()
+
+    def _ensure_remote_stores(self):
+        if self.remote_stores is None:
+            from remote import DeviceStoreSet
+
+            stores = DeviceStoreSet(self.remote_devices_dir)
+            stores.load()
+            self.remote_stores = stores
+        return self.remote_stores
+
+    def _on_remote_session(self, device, session):
+        # Called from the collector's writer thread
+        self.remote_stores.append(device, session)
+        self.remote_session_count += 1
+
+    def _poll_collector(self):
+        collector = self.collector
+        if collector is None:
+            return
+        self.collector_status_label.config(
+            text=f"Listening on port {collector.port}: "
+            f"{collector.connected} agent(s) connected, "
+            f"{self.remote_session_count} session(s) received"
+        )
+        if (
+            self.remote_session_count != self._shown_remote_sessions
+            and hasattr(self, "stats_device_var")
+            and self.stats_device_var.get() != self.LOCAL_DEVICE
+        ):
+            self._shown_remote_sessions = self.remote_session_count
+            self.update_stats()
+        self.root.after(self.COLLECTOR_POLL_MS, self._poll_collector)
 
     def start_tracking(self):
-        remote_ip = self.remote_device_ip_var.get()
-        if remote_ip:
-            messagebox.showinfo(
-                "Remote Tracking Note",
-                f"Remote IP '{remote_ip}' is set, but current tracking is LOCAL only.\nActual remote tracking is not yet implemented.",
-            )
+        start_time = time.time()
+        self.timeline = Timeline(start_time) if self.timeline_var.get() else None
+        try:
+            self.tracker.start(start_time)
+        except Exception as e:
+            self.timeline = None
+            messagebox.showerror("Tracking Error", f"Cannot start tracking: {e}")
+            return
         self.tracking = True
-        self.start_time = time.time()
-        self.app_times = {}
+        self.start_time = start_time
+        self.app_times = self.tracker.app_times
+        self.productive_counter.reset_live()
+        if self.checkpoint is not None:
+            self.checkpoint.begin(start_time)
+        self._last_checkpoint_ts = start_time
         self.status_label.config(text="Currently tracking (Local)")
         self.start_button.config(state="disabled")
         self.stop_button.config(state="normal")
-        self.tracking_thread = threading.Thread(target=self.track_activity, daemon=True)
-        self._last_app_name_for_timing_thread = ""
-        self._last_update_ts_thread = time.time()
-        self.tracking_thread.start()
+        self.ui_state.take()  # Discard anything left from the previous session
+        self._shown_time_str = None
+        self._last_heavy_update_ts = self.start_time
+        self._ui_poll()
         if self.public_monitor_showing:
             self.update_public_monitor()
 
-    def track_activity(self):
-        last_heavy_update_time = time.time()
-        while self.tracking:
-            current_ts = time.time()
-            interval_duration = current_ts - self._last_update_ts_thread
+    def _on_normalize_titles_toggled(self):
+        # Applies from the next focus change on
+        self.tracker.normalizer = (
+            self.title_normalizer if self.normalize_titles_var.get() else None
+        )
+
+    def edit_title_rules(self):
+        editor = tk.Toplevel(self.root)
+        editor.title("Title Rules")
+        editor.transient(self.root)
+        ttk.Label(
+            editor,
+            text="One rule per line: <regular expression> = <application>.\n"
+            "The first rule matching a window title (case-insensitive) names its "
+            "application; otherwise the\nprocess name or the last ' - ' part of "
+            "the title is used.",
+            justify="left",
+        ).pack(anchor="w", padx=10, pady=(10, 5))
+        text = tk.Text(editor, width=70, height=18, font=("Courier", 9))
+        text.insert("1.0", self.title_normalizer.rules_text)
+        text.pack(fill="both", expand=True, padx=10)
+        buttons = ttk.Frame(editor)
+        buttons.pack(fill="x", padx=10, pady=10)
+
+        def save():
             try:
-                window = GetForegroundWindow()
-                raw_title = GetWindowText(window)
-                current_raw_app_name = ""
-
-                # --- MODIFIED LOGIC FOR UNKNOWN/EMPTY WINDOW TITLES ---
-                if (
-                    not raw_title
-                    or not raw_title.strip()
-                    or raw_title.strip().lower() == "unknown"
-                ):
-                    current_raw_app_name = (
-                        "Unknown"  # Initial placeholder before trying PID
-                    )
-                    try:
-                        # win32process.GetWindowThreadProcessId returns (threadId, processId)
-                        _, pid = win32process.GetWindowThreadProcessId(window)
-                        if pid > 0:
-                            process = psutil.Process(pid)
-                            p_name = process.name()  # e.g., "chrome.exe"
-                            if p_name:
-                                current_raw_app_name = p_name  # Use process name
-                            else:
-                                current_raw_app_name = f"Unnamed Process (PID: {pid})"
-                        else:
-                            current_raw_app_name = "Unknown (System Window/No PID)"
-                    except psutil.NoSuchProcess:
-                        current_raw_app_name = "Unknown (Process Ended)"
-                    except psutil.AccessDenied:
-                        current_raw_app_name = "Unknown (Access Denied to Process Info)"
-                    except Exception:  # Catch other win32 or psutil errors
-                        current_raw_app_name = "Unknown (Error Getting Process Info)"
-                else:
-                    current_raw_app_name = (
-                        raw_title  # Use the window title if it's valid
-                    )
+                normalizer = TitleNormalizer(text.get("1.0", "end-1c"))
+                normalizer.save(self.rules_file)
+            except TitleRuleError as e:
+                messagebox.showerror("Invalid Rule", str(e), parent=editor)
+                return
+            except OSError as e:
+                messagebox.showerror(
+                    "Save Failed", f"Cannot save rules: {e}", parent=editor
+                )
+                return
+            self.title_normalizer = normalizer
+            self._on_normalize_titles_toggled()
+            editor.destroy()
 
-                if (
-                    not current_raw_app_name or not current_raw_app_name.strip()
-                ):  # Final fallback
-                    current_raw_app_name = "Unknown Application (Final Fallback)"
-                # --- END MODIFIED LOGIC ---
+        ttk.Button(buttons, text="Save", command=save).pack(side="right")
+        ttk.Button(buttons, text="Cancel", command=editor.destroy).pack(
+            side="right", padx=5
+        )
 
-                app_name_for_display = (
-                    current_raw_app_name[:47] + "..."
-                    if len(current_raw_app_name) > 50
-                    else current_raw_app_name
-                )
+    def _record_span(self, app_raw_name, start_ts, end_ts):
+        # Called under the engine's accumulator lock, from either thread
+        timeline = self.timeline
+        if timeline is not None:
+            timeline.add(app_raw_name, start_ts, end_ts)
+
+    def _on_foreground_change(self, current_raw_app_name, ts, raw_title=None):
+        # Called from the tracking thread: only publish the new state, the Tk
+        # side picks it up in _ui_poll. Time is already credited by the engine.
+        app_name_for_display = (
+            current_raw_app_name[:47] + "..."
+            if len(current_raw_app_name) > 50
+            else current_raw_app_name
+        )
+        self.ui_state.publish(current_app=app_name_for_display, error=None)
 
-                if self.current_app != app_name_for_display:
-                    self.current_app = app_name_for_display
-                    if self.root.winfo_exists():
-                        self.root.after(
-                            0,
-                            lambda app=self.current_app: self.current_app_label.config(
-                                text=f"Current application: {app}"
-                            ),
-                        )
-                    if (
-                        self.public_monitor_showing
-                        and self.public_monitor
-                        and self.public_monitor.winfo_exists()
-                        and hasattr(self, "public_app_label")
-                    ):
-                        self.root.after(
-                            0,
-                            lambda app=self.current_app: self.public_app_label.config(
-                                text=f"Current: {app[:30]}"
-                            ),
-                        )
-
-                # Use current_raw_app_name for time aggregation
-                if self._last_app_name_for_timing_thread:
-                    self.app_times[self._last_app_name_for_timing_thread] = (
-                        self.app_times.get(self._last_app_name_for_timing_thread, 0)
-                        + interval_duration
-                    )
-                self._last_app_name_for_timing_thread = current_raw_app_name
-                self._last_update_ts_thread = current_ts
+    def _on_tracking_error(self, e):
+        print(f"Error in tracking thread: {e}")
+        self.ui_state.publish(error=str(e))
 
-                elapsed_total_seconds = current_ts - self.start_time
-                hours, remainder = divmod(int(elapsed_total_seconds), 3600)
-                minutes, seconds = divmod(remainder, 60)
-                time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    def _ui_poll(self):
+        # Single Tk-side consumer of the tracking thread's state, run at a
+        # fixed frame rate. Intermediate states published between two frames
+        # are dropped and widgets are only touched when their text changes.
+        if not self.tracking:
+            return
+        monitor_open = (
+            self.public_monitor_showing
+            and self.public_monitor is not None
+            and self.public_monitor.winfo_exists()
+        )
+        changes = self.ui_state.take()
+        if changes.get("error"):
+            self.current_app = ""  # Re-show the app once reading works again
+            self.current_app_label.config(
+                text="Current application: Error reading window"
+            )
+        elif "current_app" in changes and changes["current_app"] != self.current_app:
+            self.current_app = changes["current_app"]
+            self.current_app_label.config(
+                text=f"Current application: {self.current_app}"
+            )
+            if monitor_open and hasattr(self, "public_app_label"):
+                self.public_app_label.config(text=f"Current: {self.current_app[:30]}")
 
-                if self.root.winfo_exists():
-                    self.root.after(
-                        0,
-                        lambda s=time_str: self.time_label.config(
-                            text=f"Elapsed time: {s}"
-                        ),
-                    )
-                if (
-                    self.public_monitor_showing
-                    and self.public_monitor
-                    and self.public_monitor.winfo_exists()
-                    and hasattr(self, "public_time_label")
-                ):
-                    self.root.after(
-                        0,
-                        lambda s=time_str: self.public_time_label.config(
-                            text=f"Time: {s}"
-                        ),
-                    )
+        current_ts = time.time()
+        self.tracker.flush(current_ts)
+        if (
+            self.checkpoint is not None
+            and current_ts - self._last_checkpoint_ts >= self.CHECKPOINT_SECONDS
+        ):
+            # Only copies the totals here; the writer thread does the I/O
+            self.checkpoint.update(
+                current_ts, self.tracker.app_times, self.tracker.title_times
+            )
+            self._last_checkpoint_ts = current_ts
 
-                if (
-                    current_ts - last_heavy_update_time > 5.0
-                ):  # Update tree and monitor less frequently
-                    if self.root.winfo_exists():
-                        self.root.after(0, self.update_session_tree)
-                    if self.public_monitor_showing:
-                        self.root.after(0, self.update_public_monitor)
-                    last_heavy_update_time = current_ts
+        elapsed_total_seconds = current_ts - self.start_time
+        hours, remainder = divmod(int(elapsed_total_seconds), 3600)
+        minutes, seconds = divmod(remainder, 60)
+        time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
-                time.sleep(1)  # Check every second
-            except Exception as e:
-                print(f"Error in tracking thread: {e}")
-                if self.root.winfo_exists():  # Check if root window still exists
-                    self.root.after(
-                        0,
-                        lambda: (
-                            self.current_app_label.config(
-                                text="Current application: Error reading window"
-                            )
-                            if self.current_app_label.winfo_exists()
-                            else None
-                        ),
-                    )
-                time.sleep(1)
+        if time_str != self._shown_time_str:
+            self._shown_time_str = time_str
+            self.time_label.config(text=f"Elapsed time: {time_str}")
+            if monitor_open and hasattr(self, "public_time_label"):
+                self.public_time_label.config(text=f"Time: {time_str}")
+
+        if (
+            current_ts - self._last_heavy_update_ts > 5.0
+        ):  # Update tree and monitor less frequently
+            self.update_session_tree()
+            if self.public_monitor_showing:
+                self.update_public_monitor()
+            self._last_heavy_update_ts = current_ts
+
+        self._ui_poll_id = self.root.after(self.UI_FRAME_MS, self._ui_poll)
 
     def update_session_tree(self):
         if not hasattr(self, "session_tree") or not self.session_tree.winfo_exists():
             return
-        for item in self.session_tree.get_children():
-            self.session_tree.delete(item)
 
         current_app_times_copy = self.app_times.copy()
 
@@ -665,65 +1005,71 @@ class ProductivityTracker:
         sorted_apps = sorted(
             display_app_times.items(), key=lambda x: x[1], reverse=True
         )
+        rows = []
         for app, seconds in sorted_apps:
             hours, remainder = divmod(int(seconds), 3600)
             minutes, sec = divmod(remainder, 60)
             time_str = f"{hours:02d}:{minutes:02d}:{sec:02d}"
-            if self.session_tree.winfo_exists():
-                self.session_tree.insert("", "end", values=(app, time_str))
+            rows.append((app, (app, time_str)))
+        # Usually only the current app's row changes between refreshes
+        self.session_tree_rows.update(rows)
 
-    def stop_tracking(self):
+    def stop_tracking(self, show_summary=True):
         if not self.tracking:
             return
 
-        # Ensure the last tracked application's time is recorded
-        if (
-            hasattr(self, "_last_app_name_for_timing_thread")
-            and self._last_app_name_for_timing_thread
-            and hasattr(self, "_last_update_ts_thread")
-        ):
-            final_interval_duration = time.time() - self._last_update_ts_thread
-            self.app_times[self._last_app_name_for_timing_thread] = (
-                self.app_times.get(self._last_app_name_for_timing_thread, 0)
-                + final_interval_duration
+        end_time = time.time()  # Not counting a wait for the history load
+        try:
+            self._ensure_data_loaded()
+        except Exception as e:
+            # Keep tracking rather than drop the session; the checkpoint
+            # still holds it and is recovered at the next start.
+            if self.checkpoint is not None:
+                self.tracker.flush()
+                self.checkpoint.update(
+                    time.time(), self.tracker.app_times, self.tracker.title_times
+                )
+            messagebox.showerror(
+                "Save Error",
+                f"The session cannot be saved because your history could not "
+                f"be loaded:\n{e}",
             )
+            return
 
         self.tracking = False
-        if self.tracking_thread and self.tracking_thread.is_alive():
-            try:
-                self.tracking_thread.join(timeout=1.5)
-            except RuntimeError:
-                pass  # Thread might already be finished
-        self.tracking_thread = None
-
-        end_time = time.time()
-        duration = end_time - self.start_time if self.start_time else 0
-        session_date = (
-            datetime.datetime.fromtimestamp(self.start_time).strftime("%Y-%m-%d")
-            if self.start_time
-            else datetime.datetime.now().strftime("%Y-%m-%d")
-        )
-        session_start_time_str = (
-            datetime.datetime.fromtimestamp(self.start_time).strftime("%H:%M:%S")
-            if self.start_time
-            else "N/A"
-        )
-
-        session = {
-            "date": session_date,
-            "start_time": session_start_time_str,
-            "end_time": datetime.datetime.fromtimestamp(end_time).strftime("%H:%M:%S"),
-            "duration": duration,
-            "applications": self.app_times.copy(),  # Store raw names and times
-        }
+        self.root.after_cancel(self._ui_poll_id)
+        self.app_times = self.tracker.stop(end_time)
+
+        if self.timeline is not None:
+            # Totals are derived from the event log so both always agree
+            self.timeline.end_ts = end_time
+            session = make_session(
+                self.start_time,
+                end_time,
+                self.timeline.totals(),
+                self.tracker.title_times,
+            )
+            session["timeline"] = self.timeline.to_dict()
+            self.timeline = None
+        else:
+            session = make_session(
+                self.start_time, end_time, self.app_times, self.tracker.title_times
+            )
+        duration = session["duration"]
         self.data["sessions"].append(session)
-        self.save_data()
+        self.store.append_session(session, self.data)
+        if self.checkpoint is not None:
+            self.checkpoint.finish()
+        self.productive_counter.invalidate()
 
         self.status_label.config(text="Not tracking")
         self.start_button.config(state="normal")
         self.stop_button.config(state="disabled")
+        self.current_app = ""
         self.current_app_label.config(text="Current application: None")
         self.time_label.config(text="Elapsed time: 00:00:00")
+        if not show_summary:
+            return
 
         messagebox.showinfo(
             "Tracking Stopped",
@@ -739,12 +1085,9 @@ class ProductivityTracker:
             or not self.stats_display_frame.winfo_exists()
         ):
             return
-        for widget in self.stats_display_frame.winfo_children():
-            if isinstance(
-                widget, FigureCanvasTkAgg
-            ):  # Ensure Matplotlib figures are closed
-                plt.close(widget.figure)
-            widget.destroy()
+        if not hasattr(self, "app_tree"):
+            self._build_stats_view()
+        self._ensure_data_loaded()
 
         option = self.stats_option.get()
         now = datetime.datetime.now()
@@ -754,77 +1097,38 @@ class ProductivityTracker:
         week_start_str = week_start_dt.strftime("%Y-%m-%d")
         month_start_str = now.strftime("%Y-%m-01")
 
-        filtered_sessions = []
         if option == "Today":
-            filtered_sessions = [
-                s for s in self.data["sessions"] if s.get("date") == today_str
-            ]
+            date_range = (today_str, today_str)
         elif option == "Yesterday":
-            filtered_sessions = [
-                s for s in self.data["sessions"] if s.get("date") == yesterday_str
-            ]
+            date_range = (yesterday_str, yesterday_str)
         elif option == "This Week":
-            filtered_sessions = [
-                s
-                for s in self.data["sessions"]
-                if s.get("date") and s.get("date") >= week_start_str
-            ]
+            date_range = (week_start_str, None)
         elif option == "This Month":
-            filtered_sessions = [
-                s
-                for s in self.data["sessions"]
-                if s.get("date") and s.get("date") >= month_start_str
-            ]
+            date_range = (month_start_str, None)
         else:  # All Time
-            filtered_sessions = self.data["sessions"]
+            date_range = (None, None)
 
-        if not filtered_sessions:
-            ttk.Label(
-                self.stats_display_frame, text=f"No data available for {option}."
-            ).pack(pady=20)
-            return
+        # Store raw names from sessions
+        combined_apps_raw, total_duration_seconds, session_count = (
+            self._aggregate_for_device(self.stats_device_var.get(), date_range)
+        )
 
-        combined_apps_raw = {}  # Store raw names from sessions
-        total_duration_seconds = 0
-        for session in filtered_sessions:
-            total_duration_seconds += session.get("duration", 0)
-            for app_raw_name, time_spent in session.get("applications", {}).items():
-                combined_apps_raw[app_raw_name] = (
-                    combined_apps_raw.get(app_raw_name, 0) + time_spent
-                )
+        if not session_count:
+            self.stats_total_label.pack_forget()
+            self.stats_content.pack_forget()
+            self.app_tree_rows.clear()
+            self.stats_no_data_label.config(text=f"No data available for {option}.")
+            self.stats_no_data_label.pack(pady=20)
+            return
 
         hours, rem = divmod(int(total_duration_seconds), 3600)
         mins, secs = divmod(rem, 60)
         total_time_str = f"{hours:02d}:{mins:02d}:{secs:02d}"
 
-        ttk.Label(
-            self.stats_display_frame,
-            text=f"Total time tracked: {total_time_str}",
-            font=("Arial", 12, "bold"),
-        ).pack(pady=10)
-
-        stats_content = ttk.Frame(self.stats_display_frame)
-        stats_content.pack(fill="both", expand=True)
-
-        table_frame = ttk.Frame(stats_content)
-        table_frame.pack(side="left", fill="both", expand=True, padx=5, pady=5)
-        columns = ("Application", "Time Spent", "Percentage")
-        app_tree = ttk.Treeview(table_frame, columns=columns, show="headings")
-        for col in columns:
-            app_tree.heading(col, text=col)
-            app_tree.column(col, width=120, anchor="w")
-        app_tree.column(
-            "Application", width=200, minwidth=150
-        )  # Wider for longer names
-        app_tree.column("Time Spent", anchor="e", width=100)
-        app_tree.column("Percentage", anchor="e", width=80)
-
-        scrollbar = ttk.Scrollbar(
-            table_frame, orient="vertical", command=app_tree.yview
-        )
-        app_tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side="right", fill="y")
-        app_tree.pack(side="left", fill="both", expand=True)
+        self.stats_no_data_label.pack_forget()
+        self.stats_total_label.config(text=f"Total time tracked: {total_time_str}")
+        self.stats_total_label.pack(pady=10)
+        self.stats_content.pack(fill="both", expand=True)
 
         # For display in stats, use truncated names if necessary
         combined_apps_display = {}
@@ -840,6 +1144,7 @@ class ProductivityTracker:
             combined_apps_display.items(), key=lambda x: x[1], reverse=True
         )
 
+        rows = []
         for app_display_name, seconds_spent in sorted_combined_apps_display:
             h_app, rem_app = divmod(int(seconds_spent), 3600)
             m_app, s_app = divmod(rem_app, 60)
@@ -849,17 +1154,13 @@ class ProductivityTracker:
                 if total_duration_seconds > 0
                 else 0
             )
-            app_tree.insert(
-                "", "end", values=(app_display_name, app_time_str, f"{percentage:.1f}%")
+            rows.append(
+                (
+                    app_display_name,
+                    (app_display_name, app_time_str, f"{percentage:.1f}%"),
+                )
             )
-
-        chart_frame = ttk.Frame(stats_content)
-        chart_frame.pack(side="right", fill="both", expand=True, padx=5, pady=5)
-
-        fig, ax = plt.subplots(figsize=(5, 4))
-        plt.subplots_adjust(
-            left=0.1, right=0.9, top=0.9, bottom=0.2
-        )  # Adjust as needed
+        self.app_tree_rows.update(rows)
 
         top_n_apps = 5
         # Use sorted_combined_apps_display for chart data
@@ -874,20 +1175,82 @@ class ProductivityTracker:
         sizes = [time_val for _, time_val in chart_data_source]
 
         if not labels:  # No data to plot
-            plt.close(fig)  # Close the figure if no data
-            ttk.Label(chart_frame, text="Not enough data for chart.").pack()
+            if self.stats_pie_view is not None:
+                self.stats_pie_view.pack_forget()
+            self.stats_chart_message.pack()
             return
 
-        ax.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=90, pctdistance=0.85)
-        ax.axis("equal")
-        ax.set_title("Top Applications Usage")
+        if self.stats_pie_view is None:
+            from charts import PieChartView
 
-        canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True)
+            self.stats_pie_view = PieChartView(self.stats_chart_frame)
+        self.stats_chart_message.pack_forget()
+        self.stats_pie_view.pack(fill="both", expand=True)
+        self.stats_pie_view.update(labels, sizes)  # No-op if data unchanged
+
+    def _refresh_device_choices(self):
+        try:
+            devices = self._ensure_remote_stores().devices()
+        except (OSError, json.JSONDecodeError):
+            devices = []
+        self.stats_device_dropdown.config(
+            values=[self.LOCAL_DEVICE, self.FLEET] + devices
+        )
+
+    def _aggregate_for_device(self, device, date_range):
+        if device == self.LOCAL_DEVICE:
+            return self.store.aggregate(*date_range)
+        remote_stores = self._ensure_remote_stores()
+        if device == self.FLEET:
+            return merge_aggregates(
+                [
+                    self.store.aggregate(*date_range),
+                    remote_stores.aggregate(*date_range),
+                ]
+            )
+        return remote_stores.aggregate(*date_range, device=device)
+
+    def _build_stats_view(self):
+        # Built once; update_stats only changes what the widgets show.
+        self.stats_no_data_label = ttk.Label(self.stats_display_frame)
+        self.stats_total_label = ttk.Label(
+            self.stats_display_frame, font=("Arial", 12, "bold")
+        )
+        self.stats_content = ttk.Frame(self.stats_display_frame)
+
+        table_frame = ttk.Frame(self.stats_content)
+        table_frame.pack(side="left", fill="both", expand=True, padx=5, pady=5)
+        columns = ("Application", "Time Spent", "Percentage")
+        self.app_tree = ttk.Treeview(table_frame, columns=columns, show="headings")
+        for col in columns:
+            self.app_tree.heading(col, text=col)
+            self.app_tree.column(col, width=120, anchor="w")
+        self.app_tree.column(
+            "Application", width=200, minwidth=150
+        )  # Wider for longer names
+        self.app_tree.column("Time Spent", anchor="e", width=100)
+        self.app_tree.column("Percentage", anchor="e", width=80)
+
+        scrollbar = ttk.Scrollbar(
+            table_frame, orient="vertical", command=self.app_tree.yview
+        )
+        self.app_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.app_tree.pack(side="left", fill="both", expand=True)
+        self.app_tree_rows = KeyedTreeview(self.app_tree)
+
+        self.stats_chart_frame = ttk.Frame(self.stats_content)
+        self.stats_chart_frame.pack(
+            side="right", fill="both", expand=True, padx=5, pady=5
+        )
+        self.stats_chart_message = ttk.Label(
+            self.stats_chart_frame, text="Not enough data for chart."
+        )
+        self.stats_pie_view = None  # Created with the first data to plot
 
     def export_data(self):
         try:
+            self._ensure_data_loaded()
             export_file_path = filedialog.asksaveasfilename(
                 defaultextension=".json",
                 filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
@@ -895,8 +1258,7 @@ class ProductivityTracker:
             )
             if not export_file_path:
                 return
-            with open(export_file_path, "w") as f:
-                json.dump(self.data, f, indent=4)
+            write_json_atomic(export_file_path, self.data)
             messagebox.showinfo(
                 "Export Successful", f"Data exported to {export_file_path}"
             )
@@ -908,13 +1270,67 @@ class ProductivityTracker:
             "Clear Data",
             "Are you sure you want to delete all tracking data? This cannot be undone.",
         ):
+            self._ensure_data_loaded()
             self.data = {"sessions": []}
             self.save_data()
+            self.productive_counter.invalidate()
             messagebox.showinfo("Data Cleared", "All tracking data has been deleted.")
             self.update_stats()  # Refresh stats tab
             if self.public_monitor_showing:
                 self.update_public_monitor()  # Refresh public monitor if showing
 
+    def migrate_to_sqlite(self):
+        self._ensure_data_loaded()
+        if type(self.store) is not SessionJournal:
+            return
+        if not messagebox.askyesno(
+            "Migrate to SQLite",
+            f"Import all sessions into {self.db_file}?\n"
+            f"{self.data_file} is kept unchanged as a backup.",
+        ):
+            return
+        try:
+            self.store, self.data = import_json_to_sqlite(self.data_file, self.db_file)
+        except Exception as e:
+            messagebox.showerror("Migration Failed", f"Failed to migrate data: {e}")
+            return
+        self.productive_counter.invalidate(self.store)
+        self.migrate_sqlite_button.config(state="disabled")
+        self.convert_archive_button.config(state="disabled")
+        messagebox.showinfo(
+            "Migration Complete",
+            f"Imported {len(self.data['sessions'])} sessions into {self.db_file}.",
+        )
+        self.update_stats()
+
+    def convert_to_archive(self):
+        self._ensure_data_loaded()
+        if type(self.store) is not SessionJournal:
+            return
+        if not messagebox.askyesno(
+            "Convert to Binary Archive",
+            f"Write all sessions to {self.archive_file}?\n"
+            "The archive is memory-mapped, so startup no longer depends on the "
+            f"size of your history.\n{self.data_file} is kept unchanged as a "
+            "backup; Export Data still writes JSON.",
+        ):
+            return
+        try:
+            self.store, self.data = convert_json_to_archive(
+                self.data_file, self.archive_file
+            )
+        except Exception as e:
+            messagebox.showerror("Conversion Failed", f"Failed to convert data: {e}")
+            return
+        self.productive_counter.invalidate(self.store)
+        self.migrate_sqlite_button.config(state="disabled")
+        self.convert_archive_button.config(state="disabled")
+        messagebox.showinfo(
+            "Conversion Complete",
+            f"Wrote {len(self.data['sessions'])} sessions to {self.archive_file}.",
+        )
+        self.update_stats()
+
     def toggle_public_monitor(self):
         if not self.public_monitor_showing:
             self.create_public_monitor()
@@ -1026,6 +1442,13 @@ class ProductivityTracker:
         self.focus_indicator.pack(anchor="w")
         self.mini_chart_frame = tk.Frame(content_frame, bg=theme["bg"])
         self.mini_chart_frame.pack(fill="both", expand=True, pady=(5, 0))
+        self.mini_chart_message = tk.Label(
+            self.mini_chart_frame,
+            bg=theme["bg"],
+            fg=theme["fg"],
+            font=("Arial", 8),
+        )
+        self.mini_chart_view = None
         goal_frame = tk.Frame(main_frame, bg=theme["bg"])
         goal_frame.pack(fill="x", pady=(5, 0))
         tk.Label(
@@ -1057,13 +1480,9 @@ class ProductivityTracker:
 
     def close_public_monitor(self):
         if self.public_monitor and self.public_monitor.winfo_exists():
-            if (
-                hasattr(self, "mini_chart_frame")
-                and self.mini_chart_frame.winfo_exists()
-            ):
-                for widget in self.mini_chart_frame.winfo_children():
-                    if isinstance(widget, FigureCanvasTkAgg):
-                        plt.close(widget.figure)  # Close matplotlib figure
+            if getattr(self, "mini_chart_view", None) is not None:
+                self.mini_chart_view.destroy()  # Releases a matplotlib figure too
+                self.mini_chart_view = None
             self.public_monitor.destroy()
         self.public_monitor = None
         self.public_monitor_showing = False
@@ -1105,6 +1524,9 @@ class ProductivityTracker:
                 and self.public_app_label.winfo_exists()
             ):
                 self.public_app_label.config(text="Current: None")
+        elif hasattr(self, "public_app_label") and self.public_app_label.winfo_exists():
+            # A freshly opened monitor would otherwise wait for the next switch
+            self.public_app_label.config(text=f"Current: {self.current_app[:30]}")
 
         self.toggle_focus_mode(update_only=True)  # Update focus indicator
         self._update_public_monitor_mini_chart(theme)
@@ -1209,10 +1631,6 @@ class ProductivityTracker:
             or not self.mini_chart_frame.winfo_exists()
         ):
             return
-        for widget in self.mini_chart_frame.winfo_children():
-            if isinstance(widget, FigureCanvasTkAgg):
-                plt.close(widget.figure)  # Close matplotlib figure
-            widget.destroy()
 
         source_data_raw = {}  # Use raw names for aggregation before display
         chart_title = "App Usage"
@@ -1223,51 +1641,26 @@ class ProductivityTracker:
             source_data_raw = current_app_times_copy
             chart_title = "Current Session Apps"
         else:
+            self._ensure_data_loaded()
             today_str = datetime.datetime.now().strftime("%Y-%m-%d")
-            today_sessions_data_raw = {}
-            for s in self.data["sessions"]:
-                if s.get("date") == today_str:
-                    for app_raw, time_val in s.get("applications", {}).items():
-                        today_sessions_data_raw[app_raw] = (
-                            today_sessions_data_raw.get(app_raw, 0) + time_val
-                        )
+            today_sessions_data_raw, _, _ = self.store.aggregate(today_str, today_str)
             if today_sessions_data_raw:
                 source_data_raw = today_sessions_data_raw
                 chart_title = "Today's Top Apps"
             else:
-                tk.Label(
-                    self.mini_chart_frame,
-                    text="No app data yet.",
-                    bg=theme["bg"],
-                    fg=theme["fg"],
-                    font=("Arial", 8),
-                ).pack(pady=5)
+                self._show_mini_chart_message("No app data yet.")
                 return
 
         if not source_data_raw:
-            tk.Label(
-                self.mini_chart_frame,
-                text="No app data.",
-                bg=theme["bg"],
-                fg=theme["fg"],
-                font=("Arial", 8),
-            ).pack(pady=5)
+            self._show_mini_chart_message("No app data.")
             return
 
         # Process raw names for display in mini-chart
         apps_data_for_chart_display = {}
         for raw_name, seconds in source_data_raw.items():
-            # Heuristic for cleaner display names in mini-chart
-            name_parts = raw_name.split(" - ")
-            display_name = name_parts[-1] if len(name_parts) > 0 else raw_name
-            # If it's a process name like "chrome.exe", keep it.
-            # If it's "Unknown (...)", keep it.
-            # If it was "Window Title - Process.exe", display_name becomes "Process.exe"
-
-            # Further simplification for common cases if needed, e.g. generic "Unknown"
-            if "unknown" in display_name.lower() and len(name_parts) > 1:
-                # Try to get a more specific part if "Unknown" is the last part of a multi-part title
-                display_name = name_parts[-2] if len(name_parts) > 1 else name_parts[0]
+            # Already-normalized names map to themselves; raw titles from
+            # older sessions are grouped by the same rules (memoized).
+            display_name = self.title_normalizer(raw_name)
 
             # Truncate display name for chart labels
             display_name_truncated = (
@@ -1285,122 +1678,47 @@ class ProductivityTracker:
         chart_apps_display = sorted_apps_display[:top_n]
 
         if not chart_apps_display:
-            tk.Label(
-                self.mini_chart_frame,
-                text="Not enough data.",
-                bg=theme["bg"],
-                fg=theme["fg"],
-                font=("Arial", 8),
-            ).pack(pady=5)
+            self._show_mini_chart_message("Not enough data.")
             return
 
         labels = [app_name for app_name, _ in chart_apps_display]
         sizes = [time_val for _, time_val in chart_apps_display]
 
         try:
-            fig, ax = plt.subplots(
-                figsize=(2.8, 1.8), dpi=65
-            )  # Small figure for monitor
-            fig.patch.set_facecolor(theme["bg"])
-            ax.set_facecolor(theme["bg"])
-
-            ax.barh(labels, sizes, color=theme["chart"], height=0.6)
-
-            ax.tick_params(axis="x", colors=theme["fg"], labelsize=6)
-            ax.tick_params(axis="y", colors=theme["fg"], labelsize=7)
-            ax.spines["top"].set_visible(False)
-            ax.spines["right"].set_visible(False)
-            ax.spines["bottom"].set_color(theme["fg"])
-            ax.spines["left"].set_color(theme["fg"])
-
-            ax.invert_yaxis()  # Top item first
-            ax.set_xlabel("Time (sec)", color=theme["fg"], fontsize=7)
-
-            plt.tight_layout(pad=0.2)  # Adjust padding
-
-            canvas = FigureCanvasTkAgg(fig, master=self.mini_chart_frame)
-            canvas_widget = canvas.get_tk_widget()
-            canvas_widget.configure(bg=theme["bg"])
-            canvas_widget.pack(fill="both", expand=True)
-            canvas.draw()
+            if self.mini_chart_view is None:
+                # Created once per monitor window
+                if self.monitor_chart_var.get() == "Matplotlib":
+                    from charts import MiniBarChartView
+
+                    self.mini_chart_view = MiniBarChartView(
+                        self.mini_chart_frame, theme, top_n=top_n
+                    )
+                else:
+                    self.mini_chart_view = CanvasBarChart(
+                        self.mini_chart_frame, theme, top_n=top_n
+                    )
+            self.mini_chart_message.pack_forget()
+            self.mini_chart_view.pack(fill="both", expand=True)
+            self.mini_chart_view.update(labels, sizes)  # No-op if data unchanged
         except Exception as e:
             print(f"Error creating mini chart: {e}")
-            if self.mini_chart_frame.winfo_exists():
-                tk.Label(
-                    self.mini_chart_frame,
-                    text="Chart error.",
-                    bg=theme["bg"],
-                    fg=theme["fg"],
-                ).pack()
+            self._show_mini_chart_message("Chart error.")
+
+    def _show_mini_chart_message(self, text):
+        if self.mini_chart_view is not None:
+            self.mini_chart_view.pack_forget()
+        self.mini_chart_message.config(text=text)
+        self.mini_chart_message.pack(pady=5)
+
+    def _on_focus_keywords_changed(self, *args):
+        self.productive_counter.set_keywords(
+            parse_focus_keywords(self.focus_apps_var.get()),
+            self.tracker.title_times.copy() if self.tracking else {},
+        )
 
     def _get_productive_time_today(self):
-        today_str = datetime.datetime.now().strftime("%Y-%m-%d")
-        total_seconds_for_goal = 0
-
-        focus_keywords = [
-            kw.strip().lower()
-            for kw in self.focus_apps_var.get().split(",")
-            if kw.strip()  # Ensure keyword is not empty
-        ]
-
-        # Aggregate all time spent today, using raw application names
-        todays_aggregated_app_times_raw = {}
-
-        # Include current session if tracking
-        if self.tracking:
-            current_app_times_copy = self.app_times.copy()
-            for app_raw_name, time_spent in current_app_times_copy.items():
-                todays_aggregated_app_times_raw[app_raw_name] = (
-                    todays_aggregated_app_times_raw.get(app_raw_name, 0) + time_spent
-                )
-
-        # Include saved sessions for today
-        for session in self.data["sessions"]:
-            if session.get("date") == today_str:
-                # If tracking, ensure we don't double-count the current session's start if it was saved and restarted
-                # This logic assumes a new tracking session replaces the old self.app_times
-                is_current_session_already_partially_counted = False
-                if self.tracking and self.start_time:
-                    session_start_dt = datetime.datetime.strptime(
-                        session.get("start_time", "00:00:00"), "%H:%M:%S"
-                    ).time()
-                    current_tracking_start_dt = datetime.datetime.fromtimestamp(
-                        self.start_time
-                    ).time()
-                    if (
-                        session.get("date")
-                        == datetime.datetime.fromtimestamp(self.start_time).strftime(
-                            "%Y-%m-%d"
-                        )
-                        and session_start_dt == current_tracking_start_dt
-                    ):
-                        is_current_session_already_partially_counted = True
-
-                if not (
-                    self.tracking
-                    and is_current_session_already_partially_counted
-                    and session.get("applications") == self.app_times
-                ):
-
-                    for app_raw_name, time_spent in session.get(
-                        "applications", {}
-                    ).items():
-                        todays_aggregated_app_times_raw[app_raw_name] = (
-                            todays_aggregated_app_times_raw.get(app_raw_name, 0)
-                            + time_spent
-                        )
-
-        for app_raw_name, time_spent in todays_aggregated_app_times_raw.items():
-            app_lower = app_raw_name.lower()
-            if (
-                self.focus_mode and focus_keywords
-            ):  # If focus mode is on AND keywords are defined
-                if any(keyword in app_lower for keyword in focus_keywords):
-                    total_seconds_for_goal += time_spent
-            else:  # If focus mode is off, or no keywords, all time is productive for goal
-                total_seconds_for_goal += time_spent
-
-        return total_seconds_for_goal
+        self._ensure_data_loaded()
+        return self.productive_counter.value(self.focus_mode)
 
     def _update_public_monitor_progress_bar(self, theme):
         if (
@@ -1502,10 +1820,16 @@ if __name__ == "__main__":
     def on_closing():
         try:
             if app.tracking:
-                app.stop_tracking()
+                # Saved without the summary dialog, which would block closing
+                app.stop_tracking(show_summary=False)
             if app.public_monitor_showing:
                 app.close_public_monitor()
-            plt.close("all")  # Close all matplotlib figures
+            if app.arp_worker is not None:
+                app.arp_worker.cancel()
+            if app.collector is not None:
+                app.collector.stop()
+            if app.checkpoint is not None:
+                app.checkpoint.close()
         except Exception as e:
             print(f"Error during closing: {e}")
         finally:
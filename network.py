@@ -0,0 +1,526 @@
+import asyncio
+import ipaddress
+import os
+import queue
+import re
+import subprocess
+import threading
+
+_INTERFACE_RE = re.compile(r"Interface:\s*([\d\.]+)\s*---.*", re.IGNORECASE)
+_IPV4_RE = re.compile(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$")
+_MAC_RE = re.compile(r"^([0-9A-Fa-f]{2}-){5}[0-9A-Fa-f]{2}$", re.IGNORECASE)
+_WIDE_GAP_RE = re.compile(r"\s{2,}")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Neighbor flags from <linux/if_arp.h>
+_ATF_COM = 0x02
+_ATF_PERM = 0x04
+
+# ioctls from <linux/sockios.h>
+_SIOCGIFADDR = 0x8915
+_SIOCGIFNETMASK = 0x891B
+
+
+class NeighborSourceError(Exception):
+    pass
+
+
+class ArpOutputParser:
+    """Incremental parser for Windows-style ``arp -a`` output.
+
+    Lines are fed one at a time; ``feed`` returns ``(interface, entries)``
+    each time an "Interface: ..." block is complete so results can be shown
+    while the command is still running.
+    """
+
+    def __init__(self):
+        self.current_interface = "Unknown"
+        self.entries = []
+
+    def _finish_block(self):
+        if not self.entries:
+            return None
+        block = (self.current_interface, self.entries)
+        self.entries = []
+        return block
+
+    def feed(self, line):
+        line = line.strip()
+        if not line:
+            return None
+        match_interface = _INTERFACE_RE.match(line)
+        if match_interface:
+            block = self._finish_block()
+            self.current_interface = match_interface.group(1)
+            return block
+        lowered = line.lower()
+        if "internet address" in lowered and "physical address" in lowered:
+            return None
+        parts = _WIDE_GAP_RE.split(line)
+        if len(parts) < 2:
+            parts = _WHITESPACE_RE.split(line)
+
+        if len(parts) >= 3:
+            ip_address, mac_address, entry_type = parts[0], parts[1], parts[2]
+            if _IPV4_RE.match(ip_address):
+                self._add(ip_address, mac_address, entry_type)
+        elif len(parts) == 2:
+            ip_address, second_part = parts[0], parts[1]
+            if _IPV4_RE.match(ip_address):
+                if _MAC_RE.match(second_part) or second_part.lower() == "(incomplete)":
+                    self._add(ip_address, second_part, "(missing)")
+                else:
+                    self._add(ip_address, "(missing)", second_part)
+        return None
+
+    def _add(self, ip_address, mac_address, entry_type):
+        self.entries.append(
+            {
+                "interface": self.current_interface,
+                "ip": ip_address,
+                "mac": mac_address,
+                "type": entry_type,
+            }
+        )
+
+    def close(self):
+        return self._finish_block()
+
+
+def _parse_arp_lines(lines):
+    parser = ArpOutputParser()
+    for line in lines:
+        block = parser.feed(line)
+        if block:
+            yield block
+    block = parser.close()
+    if block:
+        yield block
+
+
+def _parse_proc_net_arp(lines):
+    # /proc/net/arp: a header line, then one
+    # "IP address  HW type  Flags  HW address  Mask  Device" row per neighbor,
+    # in no particular order, so entries are bucketed per device.
+    blocks = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) < 6 or not _IPV4_RE.match(parts[0]):
+            continue
+        ip_address, flags, mac_address, device = parts[0], parts[2], parts[3], parts[5]
+        try:
+            flags = int(flags, 16)
+        except ValueError:
+            flags = 0
+        if flags & _ATF_PERM:
+            entry_type = "static"
+        elif flags & _ATF_COM:
+            entry_type = "dynamic"
+        else:
+            entry_type = "(incomplete)"
+        blocks.setdefault(device, []).append(
+            {
+                "interface": device,
+                "ip": ip_address,
+                "mac": mac_address.replace(":", "-"),
+                "type": entry_type,
+            }
+        )
+    return list(blocks.items())
+
+
+class NeighborSource:
+    """Somewhere ARP/neighbor entries can be read from.
+
+    ``blocks()`` yields ``(interface, entries)`` as they become available and
+    raises ``NeighborSourceError`` (or ``FileNotFoundError`` when the backing
+    file/command does not exist). ``had_output`` tells an empty table apart
+    from a source that produced nothing at all.
+    """
+
+    name = "neighbor table"
+
+    def __init__(self):
+        self.had_output = False
+        self.on_progress = None  # Optional callable(text) for status updates
+
+    def _progress(self, text):
+        if self.on_progress is not None:
+            self.on_progress(text)
+
+    def blocks(self):
+        raise NotImplementedError
+
+    def cancel(self):
+        pass
+
+
+class ProcNetArpSource(NeighborSource):
+    """Reads the kernel neighbor table directly on Linux; no process spawn."""
+
+    name = "/proc/net/arp"
+
+    def __init__(self, path="/proc/net/arp"):
+        super().__init__()
+        self.path = path
+
+    @classmethod
+    def is_supported(cls, path="/proc/net/arp"):
+        return os.access(path, os.R_OK)
+
+    def blocks(self):
+        with open(self.path, "r") as f:
+            lines = f.read().splitlines()
+        self.had_output = True
+        return iter(_parse_proc_net_arp(lines))
+
+
+class ArpCommandSource(NeighborSource):
+    """Runs ``arp -a`` and parses its output line by line as it arrives."""
+
+    name = "arp -a"
+
+    def __init__(self, command=("arp", "-a")):
+        super().__init__()
+        self.command = list(command)
+        self._process = None
+        self._lock = threading.Lock()
+        self._cancelled = False
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            if self._process is not None and self._process.poll() is None:
+                self._process.kill()
+
+    def blocks(self):
+        with self._lock:
+            if self._cancelled:
+                return
+            self._process = subprocess.Popen(
+                self.command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+            )
+        process = self._process
+
+        def lines():
+            for line in process.stdout:
+                if line.strip():
+                    self.had_output = True
+                yield line
+
+        yield from _parse_arp_lines(lines())
+        stderr = process.stderr.read().strip()
+        returncode = process.wait()
+        if returncode != 0 and stderr and not self.had_output and not self._cancelled:
+            raise NeighborSourceError(stderr)
+
+
+class FixtureNeighborSource(NeighborSource):
+    """Replays a saved ``arp -a`` capture or a copy of ``/proc/net/arp``."""
+
+    name = "fixture"
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def blocks(self):
+        with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+        self.had_output = any(line.strip() for line in lines)
+        if lines and lines[0].lower().startswith("ip address"):
+            return iter(_parse_proc_net_arp(lines))
+        return _parse_arp_lines(lines)
+
+
+def create_neighbor_source():
+    if ProcNetArpSource.is_supported():
+        return ProcNetArpSource()
+    return ArpCommandSource()
+
+
+def _linux_interface_network(device):
+    import fcntl
+    import socket
+    import struct
+
+    request = struct.pack("256s", device[:15].encode())
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        address = fcntl.ioctl(sock.fileno(), _SIOCGIFADDR, request)[20:24]
+        netmask = fcntl.ioctl(sock.fileno(), _SIOCGIFNETMASK, request)[20:24]
+    return ipaddress.ip_interface(
+        f"{socket.inet_ntoa(address)}/{socket.inet_ntoa(netmask)}"
+    )
+
+
+def interface_network(interface, max_hosts=1024):
+    """Subnet to sweep for an interface as reported by a neighbor source.
+
+    ``arp -a`` names interfaces by their address (assumed /24); the Linux
+    sources name them by device, whose address and netmask are looked up.
+    Subnets larger than ``max_hosts`` are narrowed to the interface's /24.
+    Returns None when no sensible subnet can be derived.
+    """
+    if _IPV4_RE.match(interface):
+        iface = ipaddress.ip_interface(f"{interface}/24")
+    else:
+        try:
+            iface = _linux_interface_network(interface)
+        except (ImportError, OSError, ValueError):
+            return None
+    network = iface.network
+    if network.num_addresses > max_hosts:
+        network = ipaddress.ip_interface(f"{iface.ip}/24").network
+    if network.is_loopback or network.is_link_local or network.is_multicast:
+        return None
+    return network
+
+
+async def _probe_host(host, port, semaphore, timeout, is_cancelled):
+    # A UDP datagram to any port makes the kernel resolve the next hop, which
+    # is all that is needed to get the host into the neighbor table.
+    async with semaphore:
+        if is_cancelled():
+            return False
+        loop = asyncio.get_running_loop()
+        try:
+            transport, _ = await asyncio.wait_for(
+                loop.create_datagram_endpoint(
+                    asyncio.DatagramProtocol, remote_addr=(str(host), port)
+                ),
+                timeout,
+            )
+        except (OSError, asyncio.TimeoutError):
+            return False
+        try:
+            transport.sendto(b"\0")
+        except OSError:
+            return False
+        finally:
+            transport.close()
+        return True
+
+
+async def sweep_hosts_async(
+    hosts, port=9, concurrency=256, timeout=1.0, is_cancelled=lambda: False
+):
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(
+        *(_probe_host(host, port, semaphore, timeout, is_cancelled) for host in hosts)
+    )
+    return sum(results)
+
+
+def sweep_hosts(hosts, port=9, concurrency=256, timeout=1.0, is_cancelled=None):
+    """Sends one UDP probe to every host, at most ``concurrency`` at a time.
+
+    Returns the number of probes sent. Blocks the calling thread, so call it
+    from a worker.
+    """
+    return asyncio.run(
+        sweep_hosts_async(
+            hosts,
+            port=port,
+            concurrency=concurrency,
+            timeout=timeout,
+            is_cancelled=is_cancelled or (lambda: False),
+        )
+    )
+
+
+class SubnetSweepSource(NeighborSource):
+    """Actively probes the local subnets before reading the neighbor table.
+
+    The table is read once to find the interfaces, every host of each
+    interface's subnet is probed concurrently, and after a short settle
+    delay (for replies to arrive) a fresh read is streamed as usual.
+    """
+
+    def __init__(self, make_source=create_neighbor_source, concurrency=256, settle=1.0):
+        super().__init__()
+        self.make_source = make_source
+        self.concurrency = concurrency
+        self.settle = settle
+        self._source = None
+        self._cancelled = threading.Event()
+
+    @property
+    def name(self):
+        return f"subnet sweep + {self._source.name if self._source else 'neighbors'}"
+
+    def cancel(self):
+        self._cancelled.set()
+        if self._source is not None:
+            self._source.cancel()
+
+    def blocks(self):
+        self._source = self.make_source()
+        interfaces = [interface for interface, _ in self._source.blocks()]
+        networks = []
+        for interface in interfaces:
+            network = interface_network(interface)
+            if network is not None and network not in networks:
+                networks.append(network)
+        hosts = [host for network in networks for host in network.hosts()]
+        if hosts and not self._cancelled.is_set():
+            self._progress(
+                f"Sweeping {len(hosts)} hosts on "
+                + ", ".join(str(network) for network in networks)
+                + "..."
+            )
+            sweep_hosts(
+                hosts,
+                concurrency=self.concurrency,
+                is_cancelled=self._cancelled.is_set,
+            )
+            self._cancelled.wait(self.settle)
+        if self._cancelled.is_set():
+            return
+        self._progress("Reading neighbor table...")
+        self._source = self.make_source()
+        for interface, entries in self._source.blocks():
+            # Every probed address that did not answer is left behind as an
+            # incomplete entry; only hosts that replied are interesting here.
+            entries = [entry for entry in entries if entry["type"] != "(incomplete)"]
+            if entries:
+                yield interface, entries
+        self.had_output = self._source.had_output
+
+
+class NeighborScanWorker:
+    """Reads a neighbor source off the Tk thread and streams results.
+
+    Events put on ``self.events``:
+    ``("progress", text)`` status updates from the source,
+    ``("block", interface, entries)`` for every parsed interface block, then
+    exactly one of ``("done", entry_count, had_output)``, ``("error", message)``,
+    ``("not_found",)`` or ``("cancelled",)``.
+    """
+
+    def __init__(self, source=None, timeout=15.0):
+        self.source = source if source is not None else create_neighbor_source()
+        self.timeout = timeout
+        self.events = queue.Queue()
+        self.source.on_progress = lambda text: self.events.put(("progress", text))
+        self._cancelled = False
+        self._timed_out = False
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def cancel(self):
+        self._cancelled = True
+        self.source.cancel()
+
+    def _on_timeout(self):
+        self._timed_out = True
+        self.source.cancel()
+
+    def _run(self):
+        timer = threading.Timer(self.timeout, self._on_timeout)
+        timer.daemon = True
+        timer.start()
+        entry_count = 0
+        try:
+            for interface, entries in self.source.blocks():
+                if self._cancelled:
+                    break
+                entry_count += len(entries)
+                self.events.put(("block", interface, entries))
+        except FileNotFoundError:
+            self.events.put(("not_found",))
+            return
+        except Exception as e:
+            self.events.put(("error", str(e)))
+            return
+        finally:
+            timer.cancel()
+
+        if self._cancelled:
+            self.events.put(("cancelled",))
+        elif self._timed_out:
+            self.events.put(
+                ("error", f"{self.source.name} timed out after {self.timeout:.0f}s")
+            )
+        else:
+            self.events.put(("done", entry_count, self.source.had_output))
+
+
+def _neighbor_sort_key(key):
+    interface, ip_address = key
+    return interface, tuple(int(part) for part in ip_address.split("."))
+
+
+class NeighborDiff:
+    """Tracks the neighbor set across scans, keyed by (interface, ip).
+
+    Entries from a running scan are merged over the previous result as they
+    stream in; when the scan completes, keys missing from it are reported as
+    gone and keys that were not in the previous result as new. The very
+    first scan marks nothing.
+    """
+
+    def __init__(self):
+        self.current = {}  # key -> entry, as of the last completed scan
+        self.gone = {}  # key -> entry missing from the last completed scan
+        self.new = set()
+        self._scan = None
+        self._scanned_before = False
+
+    def start(self):
+        self._scan = {}
+
+    def add(self, entries):
+        for entry in entries:
+            self._scan[(entry["interface"], entry["ip"])] = entry
+
+    def finish(self):
+        scan, self._scan = self._scan, None
+        if self._scanned_before:
+            self.new = set(scan) - set(self.current)
+            self.gone = {
+                key: entry for key, entry in self.current.items() if key not in scan
+            }
+        self.current = scan
+        self._scanned_before = True
+
+    def cancel(self):
+        self._scan = None
+
+    def rows(self):
+        # (key, values, tags) for KeyedTreeview, sorted by interface then IP.
+        # While a scan is streaming, previously known entries stay visible.
+        entries = dict(self.current)
+        new = self.new
+        gone = self.gone
+        if self._scan is not None:
+            entries.update(self._scan)
+            new = set(self._scan) - set(self.current) if self._scanned_before else ()
+            gone = {}
+        status = {key: "new" for key in new}
+        for key, entry in gone.items():
+            entries[key] = entry
+            status[key] = "gone"
+        rows = []
+        for key in sorted(entries, key=_neighbor_sort_key):
+            entry = entries[key]
+            state = status.get(key, "")
+            rows.append(
+                (
+                    key,
+                    (
+                        entry["interface"],
+                        entry["ip"],
+                        entry["mac"],
+                        entry["type"],
+                        state,
+                    ),
+                    (state,) if state else (),
+                )
+            )
+        return rows
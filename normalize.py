@@ -0,0 +1,117 @@
+import functools
+import os
+import re
+
+# One rule per line: "<regular expression> = <application>". The expression
+# is searched case-insensitively in the window title and the first rule that
+# matches wins; lines starting with "#" are comments.
+DEFAULT_TITLE_RULES = """\
+# <regular expression> = <application>, first match wins
+- Google Chrome$ = Google Chrome
+- (Mozilla )?Firefox$ = Firefox
+- (Microsoft.? )?Edge$ = Microsoft Edge
+- Visual Studio Code$ = Visual Studio Code
+- PyCharm( [\\w.]+)?$ = PyCharm
+- (Microsoft )?Word$ = Word
+- (Microsoft )?Excel$ = Excel
+- (Microsoft )?PowerPoint$ = PowerPoint
+- Outlook$ = Outlook
+- Notepad$ = Notepad
+- Slack$ = Slack
+- Discord$ = Discord
+Command Prompt$ = Command Prompt
+PowerShell$ = PowerShell
+^File Explorer$ = File Explorer
+"""
+
+# Used when no rule matches the title and the process is known.
+DEFAULT_PROCESS_NAMES = {
+    "chrome": "Google Chrome",
+    "firefox": "Firefox",
+    "msedge": "Microsoft Edge",
+    "code": "Visual Studio Code",
+    "pycharm64": "PyCharm",
+    "winword": "Word",
+    "excel": "Excel",
+    "powerpnt": "PowerPoint",
+    "outlook": "Outlook",
+    "notepad": "Notepad",
+    "cmd": "Command Prompt",
+    "powershell": "PowerShell",
+    "pwsh": "PowerShell",
+    "explorer": "File Explorer",
+    "slack": "Slack",
+    "discord": "Discord",
+}
+
+
+class TitleRuleError(ValueError):
+    pass
+
+
+def parse_title_rules(text):
+    rules = []
+    for line_no, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        pattern, sep, app = line.rpartition("=")
+        pattern, app = pattern.strip(), app.strip()
+        if not sep or not pattern or not app:
+            raise TitleRuleError(
+                f"Line {line_no}: expected '<pattern> = <application>'"
+            )
+        try:
+            rules.append((re.compile(pattern, re.IGNORECASE), app))
+        except re.error as e:
+            raise TitleRuleError(f"Line {line_no}: {e}") from None
+    return rules
+
+
+class TitleNormalizer:
+    """Maps raw window titles to canonical application names.
+
+    Titles are matched against the rules in order; without a match a known
+    owning process is looked up in ``process_names``, and failing that the
+    last " - " part of the title is used. Results are memoized per
+    ``(title, process)`` in a bounded LRU, as titles repeat constantly.
+    """
+
+    def __init__(
+        self, rules_text=DEFAULT_TITLE_RULES, process_names=None, cache_size=4096
+    ):
+        self.rules_text = rules_text
+        self.rules = parse_title_rules(rules_text)
+        self.process_names = dict(
+            DEFAULT_PROCESS_NAMES if process_names is None else process_names
+        )
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._normalize)
+
+    @classmethod
+    def from_file(cls, path):
+        # Falls back to the default rules until the user saves their own
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(f.read())
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.rules_text)
+
+    def __call__(self, raw_title, process_name=None):
+        return self._cached(raw_title, process_name)
+
+    def _normalize(self, raw_title, process_name):
+        for pattern, app in self.rules:
+            if pattern.search(raw_title):
+                return app
+        if raw_title.startswith(("Unknown (", "Unnamed Process (")):
+            return raw_title  # Placeholders from WindowProbe.read_app
+        if process_name:
+            base = os.path.basename(process_name).lower()
+            app = self.process_names.get(base[:-4] if base.endswith(".exe") else base)
+            if app is not None:
+                return app
+        # Most applications put their name last: "Document - Application"
+        return raw_title.rsplit(" - ", 1)[-1].strip() or raw_title
@@ -0,0 +1,569 @@
+"""Remote tracking: a headless agent and the collector built into the app.
+
+Agents run the tracking engine and push focus-change events to the
+collector in batches over one persistent TCP connection. Each frame is a
+4-byte big-endian length followed by zlib-compressed JSON. Every batch is
+acknowledged; unacknowledged batches stay in a small on-disk spool and are
+resent after a reconnect, so an agent can stay offline without losing time.
+
+Run an agent with:  python remote.py --host 192.168.1.10 [--port 8765]
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import re
+import socket
+import struct
+import threading
+import time
+import urllib.parse
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from normalize import TitleNormalizer
+from storage import SessionJournal, make_session, merge_aggregates, write_json_atomic
+from tracking import (
+    AppTimeAccumulator,
+    PollingForegroundSource,
+    ReplayWindowProbe,
+    TrackerEngine,
+)
+
+DEFAULT_PORT = 8765
+MAX_FRAME = 16 * 1024 * 1024
+MAX_DECOMPRESSED = 64 * 1024 * 1024  # Decompressed size of one frame
+_LENGTH = struct.Struct(">I")
+_BATCH_KEYS = ("device", "boot", "seq", "events")
+# Copies of damaged device files kept by SessionJournal next to the originals
+_DAMAGED_COPY = re.compile(r"\.corrupt-\d{8}-\d{6}(-\d+)?$")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_frame(message):
+    payload = zlib.compress(json.dumps(message, separators=(",", ":")).encode())
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def decode_payload(payload):
+    # Bounded, as a small frame can inflate to gigabytes
+    decompressor = zlib.decompressobj()
+    try:
+        data = decompressor.decompress(payload, MAX_DECOMPRESSED)
+        if decompressor.unconsumed_tail:
+            raise ProtocolError("Frame expands beyond the limit")
+        message = json.loads(data)
+    except (zlib.error, ValueError) as e:
+        raise ProtocolError(f"Malformed frame: {e}")
+    if not isinstance(message, dict):
+        raise ProtocolError("Frame is not a JSON object")
+    return message
+
+
+def _check_length(length):
+    if length > MAX_FRAME:
+        raise ProtocolError(f"Frame of {length} bytes exceeds the limit")
+    return length
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Connection closed by peer")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock):
+    (length,) = _LENGTH.unpack(_recv_exactly(sock, _LENGTH.size))
+    return decode_payload(_recv_exactly(sock, _check_length(length)))
+
+
+async def read_frame(reader):
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return decode_payload(await reader.readexactly(_check_length(length)))
+
+
+class Backoff:
+    """Exponential reconnect delay with jitter, reset after a success."""
+
+    def __init__(self, initial=1.0, maximum=60.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.delay = initial
+
+    def next_delay(self):
+        delay = self.delay
+        self.delay = min(self.delay * 2, self.maximum)
+        return delay * random.uniform(0.5, 1.0)
+
+    def reset(self):
+        self.delay = self.initial
+
+
+class EventSpool:
+    """Batches that have not been acknowledged yet, mirrored to a JSONL file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.batches = []
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        self.batches.append(json.loads(line))
+                    except ValueError:
+                        break  # Torn last line from a crash; drop it
+
+    def append(self, batch):
+        self.batches.append(batch)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(batch, separators=(",", ":")) + "\n")
+
+    def acknowledge(self, count):
+        del self.batches[:count]
+        if not self.batches:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for batch in self.batches:
+                f.write(json.dumps(batch, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+class RemoteAgent:
+    """Runs a TrackerEngine and ships its focus changes to a collector.
+
+    Events are ``["start", ts]``, ``["focus", ts, app]`` and ``["stop", ts]``,
+    with the raw window title appended to a focus event when it differs;
+    they are gathered for ``batch_interval`` seconds and sent as one frame.
+    """
+
+    def __init__(
+        self,
+        host,
+        port=DEFAULT_PORT,
+        device=None,
+        engine=None,
+        spool_file="agent_spool.jsonl",
+        batch_interval=30.0,
+        connect_timeout=5.0,
+    ):
+        self.host = host
+        self.port = port
+        self.device = device or socket.gethostname()
+        self.boot = uuid.uuid4().hex
+        self.engine = engine or TrackerEngine()
+        self.engine.on_change = self._on_change
+        self.spool = EventSpool(spool_file)
+        self.batch_interval = batch_interval
+        self.connect_timeout = connect_timeout
+        self.backoff = Backoff()
+        self._events = []
+        self._events_lock = threading.Lock()
+        self._seq = 0
+        self._sock = None
+        self._retry_at = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _record(self, event):
+        with self._events_lock:
+            self._events.append(event)
+
+    def _on_change(self, app_raw_name, ts, raw_title=None):
+        if raw_title is None or raw_title == app_raw_name:
+            self._record(["focus", ts, app_raw_name])
+        else:
+            self._record(["focus", ts, app_raw_name, raw_title])
+
+    def start(self):
+        start_ts = time.time()
+        self._record(["start", start_ts])
+        self.engine.start(start_ts)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        end_ts = time.time()
+        self.engine.stop(end_ts)
+        self._record(["stop", end_ts])
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._retry_at = 0.0
+        self.flush()  # Last attempt; whatever is left stays spooled
+        self._disconnect()
+
+    def _run(self):
+        while not self._stop_event.wait(self.batch_interval):
+            self.flush()
+
+    def flush(self):
+        with self._events_lock:
+            events, self._events = self._events, []
+        if events:
+            self._seq += 1
+            self.spool.append(
+                {
+                    "type": "batch",
+                    "device": self.device,
+                    "boot": self.boot,
+                    "seq": self._seq,
+                    "events": events,
+                }
+            )
+        if self.spool.batches and time.monotonic() >= self._retry_at:
+            self._send_spooled()
+
+    def _connect(self):
+        sock = socket.create_connection(
+            (self.host, self.port), timeout=self.connect_timeout
+        )
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _send_spooled(self):
+        sent = 0
+        try:
+            if self._sock is None:
+                self._sock = self._connect()
+            for batch in self.spool.batches:
+                self._sock.sendall(encode_frame(batch))
+                ack = recv_frame(self._sock)
+                if ack.get("type") != "ack" or ack.get("seq") != batch["seq"]:
+                    raise ProtocolError(f"Unexpected reply: {ack!r}")
+                sent += 1
+        except (OSError, ProtocolError):
+            self._disconnect()
+            self._retry_at = time.monotonic() + self.backoff.next_delay()
+        else:
+            self.backoff.reset()
+        if sent:
+            self.spool.acknowledge(sent)
+
+
+class SessionAssembler:
+    """Turns one device's event stream back into session records.
+
+    Uses the same accumulator as local tracking, so a remote session's
+    ``applications`` match what the agent's own engine measured.
+    """
+
+    def __init__(self, on_session):
+        self.on_session = on_session
+        self.activity = None
+        self.start_ts = None
+        self.last_ts = None
+
+    def feed(self, event):
+        kind, ts = event[0], event[1]
+        if kind == "start":
+            if self.activity is not None:
+                # The agent restarted without a clean stop
+                self._close(self.last_ts)
+            self._open(ts)
+        elif kind == "focus":
+            if self.activity is None:
+                self._open(ts)
+            self.activity.switch(event[2], ts, event[3] if len(event) > 3 else None)
+        elif kind == "stop" and self.activity is not None:
+            self._close(ts)
+        self.last_ts = ts if self.last_ts is None else max(self.last_ts, ts)
+
+    def _open(self, ts):
+        self.activity = AppTimeAccumulator()
+        self.activity.reset(ts)
+        self.start_ts = ts
+
+    def _close(self, ts):
+        self.activity.flush(ts)
+        session = make_session(
+            self.start_ts, ts, self.activity.app_times, self.activity.title_times
+        )
+        self.activity = None
+        self.start_ts = None
+        self.on_session(session)
+
+
+class DeviceStoreSet:
+    """One session journal per remote device, plus fleet-wide aggregates.
+
+    Each device's history lives in ``<directory>/<quoted device>.json`` (and
+    its ``.journal``) using the same session schema as local tracking. The
+    collector's writer thread appends while the Tk thread aggregates, so all
+    access goes through one lock.
+    """
+
+    def __init__(self, directory="remote_devices"):
+        self.directory = directory
+        self.stores = {}  # device -> SessionJournal
+        self._lock = threading.Lock()
+
+    def _path(self, device):
+        return os.path.join(
+            self.directory, urllib.parse.quote(device, safe="") + ".json"
+        )
+
+    def _open(self, device):
+        path = self._path(device)
+        os.makedirs(self.directory, exist_ok=True)
+        if not os.path.exists(path):
+            write_json_atomic(path, {"sessions": []})
+        store = SessionJournal(path)
+        store.load()
+        self.stores[device] = store
+        return store
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self.stores = {}
+            for path in glob.glob(os.path.join(self.directory, "*.json")):
+                name = os.path.splitext(os.path.basename(path))[0]
+                if _DAMAGED_COPY.search(name):
+                    continue
+                self._open(urllib.parse.unquote(name))
+
+    def append(self, device, session):
+        with self._lock:
+            store = self.stores.get(device) or self._open(device)
+            store.data["sessions"].append(session)
+            store.append_session(session, store.data)
+
+    def devices(self):
+        with self._lock:
+            return sorted(self.stores)
+
+    def aggregate(self, start_date=None, end_date=None, device=None):
+        # One device's (apps, duration, session_count), or the whole fleet's
+        with self._lock:
+            if device is not None:
+                store = self.stores.get(device)
+                if store is None:
+                    return {}, 0, 0
+                return store.aggregate(start_date, end_date)
+            return merge_aggregates(
+                store.aggregate(start_date, end_date) for store in self.stores.values()
+            )
+
+
+class RemoteCollector:
+    """Receives agent batches on an asyncio server running in its own thread.
+
+    Connection handlers only parse frames; batches go through one bounded
+    queue to a single consumer that rebuilds sessions and hands finished ones
+    to ``on_session(device, session)`` on a dedicated writer thread. A batch
+    is acknowledged only after that, so when the queue is full handlers stop
+    reading, TCP windows fill up and agents slow down instead of the
+    collector buffering without bound. ``allowed_hosts`` optionally restricts
+    which peer addresses may connect.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=DEFAULT_PORT,
+        on_session=None,
+        allowed_hosts=(),
+        queue_size=1024,
+        max_connections=1000,
+    ):
+        self.host = host
+        self.port = port
+        self.on_session = on_session
+        self.allowed_hosts = set(allowed_hosts)
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self.assemblers = {}  # device -> SessionAssembler
+        self.last_seq = {}  # (device, boot) -> last processed seq
+        self.connected = 0
+        self.rejected = 0
+        self.batches = 0
+        self.events = 0
+        self._queue = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._writer = None
+
+    def start(self):
+        ready = threading.Event()
+        errors = []
+        self._writer = ThreadPoolExecutor(max_workers=1)
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._queue = asyncio.Queue(self.queue_size)
+            try:
+                self._server = self._loop.run_until_complete(
+                    asyncio.start_server(
+                        self._handle, self.host, self.port, backlog=1024
+                    )
+                )
+            except OSError as e:
+                errors.append(e)
+                ready.set()
+                self._loop.close()
+                return
+            self.port = self._server.sockets[0].getsockname()[1]
+            consumer = self._loop.create_task(self._consume())
+            ready.set()
+            try:
+                self._loop.run_forever()
+            finally:
+                consumer.cancel()
+                self._server.close()
+                self._loop.run_until_complete(self._server.wait_closed())
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            self._thread = None
+            self._writer.shutdown()
+            raise errors[0]
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+        self._writer.shutdown(wait=True)
+
+    async def _handle(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        if (
+            self.allowed_hosts and (peer is None or peer[0] not in self.allowed_hosts)
+        ) or self.connected >= self.max_connections:
+            self.rejected += 1
+            writer.close()
+            return
+        self.connected += 1
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                message = await read_frame(reader)
+                if message.get("type") != "batch":
+                    raise ProtocolError(f"Unexpected message: {message.get('type')}")
+                missing = [key for key in _BATCH_KEYS if key not in message]
+                if missing:
+                    raise ProtocolError(f"Batch without {', '.join(missing)}")
+                processed = loop.create_future()
+                await self._queue.put((message, processed))  # Waits while full
+                await processed
+                writer.write(encode_frame({"type": "ack", "seq": message["seq"]}))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            self.connected -= 1
+            writer.close()
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            message, processed = await self._queue.get()
+            try:
+                sessions = self._process_batch(message)
+                if sessions and self.on_session is not None:
+                    await loop.run_in_executor(
+                        self._writer, self._deliver, message["device"], sessions
+                    )
+            except Exception as e:
+                processed.set_exception(ProtocolError(str(e)))
+            else:
+                processed.set_result(None)
+
+    def _deliver(self, device, sessions):
+        for session in sessions:
+            self.on_session(device, session)
+
+    def _process_batch(self, batch):
+        # Returns the sessions this batch completed
+        device = batch["device"]
+        key = (device, batch["boot"])
+        if batch["seq"] <= self.last_seq.get(key, 0):
+            return []  # Resent after a lost ack; already processed
+        self.last_seq[key] = batch["seq"]
+        sessions = []
+        assembler = self.assemblers.get(device)
+        if assembler is None:
+            assembler = self.assemblers[device] = SessionAssembler(sessions.append)
+        assembler.on_session = sessions.append
+        for event in batch["events"]:
+            assembler.feed(event)
+        self.batches += 1
+        self.events += len(batch["events"])
+        return sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless productivity agent")
+    parser.add_argument("--host", required=True, help="collector address")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--device", help="name shown on the collector")
+    parser.add_argument("--interval", type=float, default=30.0, help="batch seconds")
+    parser.add_argument("--spool", default="agent_spool.jsonl")
+    parser.add_argument(
+        "--replay", help="JSON script for ReplayWindowProbe instead of a real probe"
+    )
+    parser.add_argument(
+        "--rules",
+        default="title_rules.txt",
+        help="title normalization rules (built-in rules if the file is missing)",
+    )
+    args = parser.parse_args()
+
+    source = None
+    if args.replay:
+        probe = ReplayWindowProbe.from_file(args.replay, loop=True)
+        source = PollingForegroundSource(probe.read_capture)
+    engine = TrackerEngine(
+        source=source, normalizer=TitleNormalizer.from_file(args.rules)
+    )
+    agent = RemoteAgent(
+        args.host,
+        args.port,
+        device=args.device,
+        engine=engine,
+        spool_file=args.spool,
+        batch_interval=args.interval,
+    )
+    agent.start()
+    print(f"Agent '{agent.device}' sending to {args.host}:{args.port}; Ctrl+C stops")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agent.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1003 @@
+import bisect
+import datetime
+import glob
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from array import array
+from collections.abc import Mapping, Sequence
+
+from timeline import pack_array, session_days, unpack_array
+
+
+def write_json_atomic(path, data, indent=4):
+    # Write to a sibling temp file and rename over the target so a crash
+    # mid-write leaves either the old file or the new one, never a truncated one.
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=indent, default=_to_json)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def lock_exclusive(path):
+    """Opens and locks ``path`` for this process, or returns None when
+    another process holds the lock. The lock lasts until the file is closed.
+    """
+    try:
+        f = open(path, "a+b")
+    except OSError:
+        return None
+    try:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def _to_json(value):
+    # AppTimes are written out as plain {app: seconds} objects, and lazily
+    # decoded session lists as arrays
+    if isinstance(value, Mapping):
+        return dict(value.items())
+    if isinstance(value, Sequence):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class AppTable:
+    """Application names interned once per store, each with an integer id."""
+
+    def __init__(self, names=()):
+        self.names = []  # app_id -> raw name
+        self.ids = {}  # raw name -> app_id
+        for app_raw_name in names:
+            self.intern(app_raw_name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, app_raw_name):
+        app_id = self.ids.get(app_raw_name)
+        if app_id is None:
+            app_id = self.ids[app_raw_name] = len(self.names)
+            self.names.append(app_raw_name)
+        return app_id
+
+
+class AppTimes(Mapping):
+    """Read-only ``{app: seconds}`` of one session over a shared AppTable.
+
+    Only two arrays are kept per session (app ids and seconds), so history
+    grows with the number of distinct applications rather than with
+    sessions times applications.
+    """
+
+    __slots__ = ("table", "ids", "seconds", "_positions")
+
+    def __init__(self, table, ids, seconds):
+        self.table = table
+        self.ids = ids
+        self.seconds = seconds
+        self._positions = None  # app_id -> index, built on the first lookup
+
+    @classmethod
+    def from_dict(cls, table, applications):
+        if isinstance(applications, AppTimes) and applications.table is table:
+            return applications
+        ids, seconds = array("I"), array("d")
+        for app_raw_name, time_spent in applications.items():
+            ids.append(table.intern(app_raw_name))
+            seconds.append(time_spent)
+        return cls(table, ids, seconds)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        names = self.table.names
+        return (names[app_id] for app_id in self.ids)
+
+    def __getitem__(self, app_raw_name):
+        if self._positions is None:
+            self._positions = {app_id: i for i, app_id in enumerate(self.ids)}
+        i = self._positions.get(self.table.ids.get(app_raw_name))
+        if i is None:
+            raise KeyError(app_raw_name)
+        return self.seconds[i]
+
+    def items(self):
+        names = self.table.names
+        return [
+            (names[app_id], time_spent)
+            for app_id, time_spent in zip(self.ids, self.seconds)
+        ]
+
+    def __repr__(self):
+        return f"AppTimes({dict(self.items())!r})"
+
+
+# Session fields held as AppTimes, with their keys in the JSON snapshot
+_INTERNED_FIELDS = (
+    ("applications", "app_ids", "seconds"),
+    ("titles", "title_ids", "title_seconds"),
+)
+
+
+def make_session(start_ts, end_ts, app_times, titles=None):
+    # The session record written to history, for local and remote sessions.
+    duration = end_ts - start_ts if start_ts else 0
+    session_date = (
+        datetime.datetime.fromtimestamp(start_ts).strftime("%Y-%m-%d")
+        if start_ts
+        else datetime.datetime.now().strftime("%Y-%m-%d")
+    )
+    session_start_time_str = (
+        datetime.datetime.fromtimestamp(start_ts).strftime("%H:%M:%S")
+        if start_ts
+        else "N/A"
+    )
+    session = {
+        "date": session_date,
+        "start_time": session_start_time_str,
+        "end_time": datetime.datetime.fromtimestamp(end_ts).strftime("%H:%M:%S"),
+        "duration": duration,
+        "applications": dict(app_times),  # Store raw names and times
+    }
+    if titles and titles.keys() != app_times.keys():
+        # Raw window titles, kept when applications are normalized names
+        session["titles"] = dict(titles)
+    return session
+
+
+def merge_aggregates(results):
+    # Combines (apps, duration, session_count) tuples from several stores.
+    apps, total_duration, session_count = {}, 0, 0
+    for result_apps, duration, count in results:
+        for app_raw_name, seconds in result_apps.items():
+            apps[app_raw_name] = apps.get(app_raw_name, 0) + seconds
+        total_duration += duration
+        session_count += count
+    return apps, total_duration, session_count
+
+
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+_TOKEN_RE = re.compile(r'[{}\[\]"]')
+# Rest of a JSON string after its opening quote, up to the closing quote
+_STRING_TAIL_RE = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_SCALAR_RE = re.compile(r"[^,\]}\s]+")
+_DECODER = json.JSONDecoder()
+
+
+class SnapshotReader:
+    """Incremental reader for the ``productivity_data.json`` snapshot.
+
+    Iterating yields ``(key, value)`` for each top-level entry, except that
+    the ``sessions`` array is yielded one element at a time as
+    ``("sessions", session)``. The file is read in chunks and values are
+    decoded straight from the buffer, which only holds the part not yet
+    consumed, so parsing memory is bounded by the largest single session
+    rather than the whole history.
+
+    A session that is not valid JSON is skipped and recorded in
+    ``quarantined`` as ``(offset, error, text)``. In an indented file every
+    session starts on a line of its own at the same indentation, so reading
+    resumes at the next such line (or at the array's closing bracket).
+    Damage that cannot be skipped that way ends the read early and sets
+    ``stopped_early``. Either way ``problems`` lists what went wrong.
+    """
+
+    def __init__(self, path, chunk_size=1 << 20):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.problems = []
+        self.quarantined = []
+        self.stopped_early = False
+        self._file = None
+        self._boundary = None  # Start of the next session, see _sessions
+        self._buf = ""
+        self._pos = 0
+        self._offset = 0  # Character offset of self._buf[0] in the file
+        self._eof = False
+
+    def __iter__(self):
+        with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+            self._file = f
+            try:
+                yield from self._document()
+            except ValueError as e:
+                self.stopped_early = True
+                self.problems.append(
+                    f"Stopped reading at character {self.position}: {e}"
+                )
+
+    @property
+    def position(self):
+        # Character offset in the file of the next unread character
+        return self._offset + self._pos
+
+    def _fill(self, size=0):
+        if self._eof:
+            return False
+        chunk = self._file.read(max(size, self.chunk_size))
+        if not chunk:
+            self._eof = True
+            return False
+        # Drop what has been consumed before growing the buffer
+        self._offset += self._pos
+        self._buf = self._buf[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            self._pos = _WHITESPACE_RE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars):
+        char = self._peek()
+        if not char or char not in chars:
+            found = repr(char) if char else "end of file"
+            raise ValueError(f"expected {' or '.join(map(repr, chars))}, found {found}")
+        self._pos += 1
+        return char
+
+    def _value_end(self, start):
+        # End of the JSON value at self._buf[start], or None if it is not
+        # complete within the buffer yet.
+        buf = self._buf
+        if buf[start] not in '{["':
+            match = _SCALAR_RE.match(buf, start)
+            if match is None:
+                raise ValueError(f"unexpected {buf[start]!r}")
+            if match.end() == len(buf) and not self._eof:
+                return None
+            return match.end()
+        depth = 0
+        pos = start
+        while True:
+            match = _TOKEN_RE.search(buf, pos)
+            if match is None:
+                return None
+            pos = match.end()
+            token = match.group()
+            if token == '"':
+                match = _STRING_TAIL_RE.match(buf, pos)
+                if match is None:
+                    return None
+                pos = match.end()
+                if depth == 0:
+                    return pos
+            elif token in "{[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return pos
+
+    def _value(self, resync=False):
+        # Returns (value, None), or (None, (text, error)) for a value that is
+        # complete but not valid JSON. Decoding is tried first; the slower
+        # scan for the value's extent only runs when that fails, to tell a
+        # value cut off by the end of the buffer from a damaged one.
+        if not self._peek():
+            raise ValueError("unexpected end of file")
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                if resync and self._boundary is not None:
+                    return self._session_until_boundary()
+                end = self._value_end(self._pos)
+                if end is not None:
+                    text = self._buf[self._pos : end]
+                    self._pos = end
+                    return None, (text, f"{e.msg} at character {self._offset + e.pos}")
+            else:
+                # A number at the very end of the buffer may continue
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value, None
+            # Grow geometrically so a long damaged value is not rescanned
+            # once per chunk.
+            if not self._fill(len(self._buf) - self._pos):
+                raise ValueError("unexpected end of file")
+
+    def _document(self):
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key, damaged = self._value()
+            if damaged is None:
+                self._expect(":")
+                value, damaged = (None, None) if key == "sessions" else self._value()
+            if damaged is not None:
+                raise ValueError(damaged[1])
+            if key == "sessions":
+                yield from self._sessions()
+            else:
+                yield key, value
+            if self._expect(",}") == "}":
+                return
+
+    def _sessions(self):
+        self._expect("[")
+        self._boundary = self._element_boundary()
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            offset = self.position
+            session, damaged = self._value(resync=True)
+            if damaged is not None:
+                self.quarantine(offset, damaged[1], damaged[0])
+            else:
+                yield "sessions", session
+            char = self._peek()
+            if char in (",", "]"):
+                self._pos += 1
+                if char == "]":
+                    return
+            elif self._boundary is None or not char:
+                self._expect(",]")
+            elif char == "{" and damaged is None:
+                self.problems.append(
+                    f"Missing ',' before the session at character {self.position}"
+                )
+            elif char != "{":
+                # Stray text between sessions
+                offset = self.position
+                end = self._find_boundary()
+                text = self._buf[self._pos : end]
+                self._pos = end
+                self.quarantine(offset, "unexpected text between sessions", text)
+                if self._expect("{]") == "]":
+                    return
+                self._pos -= 1  # Back to the next session's "{"
+
+    def _element_boundary(self):
+        # Pattern for a line that starts the next session or closes the
+        # array, from the indentation of the first session. None for files
+        # written on one line, where sessions cannot be told apart that way.
+        self._boundary_width = 0
+        while True:
+            end = _WHITESPACE_RE.match(self._buf, self._pos).end()
+            if end < len(self._buf) or not self._fill():
+                break
+        whitespace = self._buf[self._pos : end]
+        newline = whitespace.rfind("\n")
+        indent = whitespace[newline + 1 :]
+        if newline < 0 or not indent:
+            return None
+        self._boundary_width = len(indent) + 2
+        return re.compile(
+            "\n" + re.escape(indent) + r"\{" + rf"|\n[ \t]{{0,{len(indent) - 1}}}\]"
+        )
+
+    def _find_boundary(self):
+        # Buffer index of the next session or closing bracket after
+        # self._pos, or the end of the file; fills the buffer as needed.
+        skip = 1  # Searched relative to self._pos, which _fill moves
+        while True:
+            match = self._boundary.search(self._buf, self._pos + skip)
+            if match is not None:
+                return match.end() - 1
+            # A boundary may straddle the end of the buffer
+            skip = max(1, len(self._buf) - self._pos - self._boundary_width)
+            if not self._fill(len(self._buf) - self._pos):
+                return len(self._buf)
+
+    def _session_until_boundary(self):
+        # The session is taken to end where the next one starts; it is kept
+        # if it decodes within that, so one only cut off by the end of the
+        # buffer is not mistaken for a damaged one.
+        boundary = self._find_boundary()
+        try:
+            value, end = _DECODER.raw_decode(self._buf, self._pos)
+            if end <= boundary:
+                self._pos = end
+                return value, None
+            error = "session runs into the next one"
+        except json.JSONDecodeError as e:
+            error = f"{e.msg} at character {self._offset + e.pos}"
+        text = self._buf[self._pos : boundary].rstrip().rstrip(",").rstrip()
+        self._pos = boundary
+        return None, (text, error)
+
+    def quarantine(self, offset, error, text):
+        self.quarantined.append((offset, error, text))
+        self.problems.append(f"Skipped the session at character {offset}: {error}")
+
+
+class SessionJournal:
+    """Snapshot file plus an append-only JSON Lines journal of finished sessions.
+
+    ``productivity_data.json`` keeps its existing layout and acts as the
+    compacted snapshot. Each finished session is appended to the journal as a
+    single line, so saving costs one session instead of the whole history.
+    Once enough lines pile up the journal is folded back into the snapshot.
+    """
+
+    def __init__(self, data_file, journal_file=None, compact_every=200):
+        self.data_file = data_file
+        self.journal_file = journal_file or os.path.splitext(data_file)[0] + ".journal"
+        self.compact_every = compact_every
+        self.last_seq = 0
+        self.pending = 0
+        self.data = {"sessions": []}
+        self.rollup = DailyRollup()
+        self.apps = AppTable()
+        self.load_problems = []  # What SnapshotReader had to skip on load
+        # Set when the snapshot could only be read in part; it is then left
+        # as it is and new sessions stay in the journal.
+        self.read_only = False
+        self.damaged_copy = None
+        self.quarantine_file = os.path.splitext(data_file)[0] + ".quarantine"
+
+    def load(self):
+        # The snapshot is streamed: sessions are decoded and added to the
+        # rollup one at a time, and damaged ones are set aside instead of
+        # failing the whole load.
+        if not os.path.exists(self.data_file):
+            raise FileNotFoundError(self.data_file)
+        reader = SnapshotReader(self.data_file)
+        data = {"sessions": []}
+        sessions = data["sessions"]
+        self.apps = AppTable()
+        self.rollup = DailyRollup()
+        rebuild_rollup = False
+        snapshot_seq = 0
+        for key, value in reader:
+            if key == "sessions":
+                try:
+                    session = self._decode_session(dict(value))
+                    if "app_ids" in value and not self.apps.names:
+                        # Files written before the table was stored first
+                        rebuild_rollup = True
+                    else:
+                        self.rollup.add_session(session)
+                except (ValueError, TypeError, KeyError, IndexError) as e:
+                    reader.quarantine(
+                        reader.position, f"invalid session: {e}", json.dumps(value)
+                    )
+                    continue
+                sessions.append(session)
+            elif key == "apps":
+                for app_raw_name in value:
+                    self.apps.intern(app_raw_name)
+            elif key == "journal_seq":
+                snapshot_seq = value
+            else:
+                data[key] = value
+        if rebuild_rollup:
+            self.rollup.rebuild(sessions)
+        self.load_problems = reader.problems
+        self.read_only = reader.stopped_early
+        if reader.problems:
+            self._set_aside(reader)
+        self.last_seq = snapshot_seq
+        self.pending = 0
+        for seq, session in self._read_journal():
+            # Entries already folded into the snapshot can survive a crash
+            # between the snapshot rename and the journal truncation.
+            if seq <= snapshot_seq:
+                continue
+            self.last_seq = max(self.last_seq, seq)
+            try:
+                session = self._decode_session(session)
+                self.rollup.add_session(session)
+            except (ValueError, TypeError, KeyError, IndexError, AttributeError):
+                continue  # Skipped like an unparsable line
+            sessions.append(session)
+            self.pending += 1
+        self.data = data
+        if reader.problems and not self.read_only:
+            # Save what was readable, so the damage is only set aside once
+            self.compact(data)
+        return data
+
+    def _set_aside(self, reader):
+        # Keep the damaged snapshot and the skipped sessions before anything
+        # can compact over them.
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        base = os.path.splitext(self.data_file)[0]
+        # A snapshot left unchanged since it was set aside is not copied and
+        # quarantined again on every load
+        status = os.stat(self.data_file)
+        for path in glob.glob(f"{glob.escape(base)}.corrupt-*.json"):
+            copy = os.stat(path)
+            if (copy.st_size, copy.st_mtime) == (status.st_size, status.st_mtime):
+                self.damaged_copy = path
+                return
+        self.damaged_copy = f"{base}.corrupt-{stamp}.json"
+        n = 1
+        while os.path.exists(self.damaged_copy):
+            n += 1
+            self.damaged_copy = f"{base}.corrupt-{stamp}-{n}.json"
+        shutil.copy2(self.data_file, self.damaged_copy)
+        with open(self.quarantine_file, "a", encoding="utf-8") as f:
+            for offset, error, text in reader.quarantined:
+                record = {"time": stamp, "offset": offset, "error": error, "text": text}
+                f.write(json.dumps(record) + "\n")
+
+    def _decode_session(self, session):
+        # Snapshot sessions reference the app table by id; sessions from the
+        # journal and from files written before the table are plain dicts.
+        for field, ids_key, seconds_key in _INTERNED_FIELDS:
+            if ids_key in session:
+                ids = unpack_array("I", session.pop(ids_key))
+                seconds = unpack_array("d", session.pop(seconds_key))
+                if len(ids) != len(seconds) or (
+                    self.apps.names and max(ids, default=0) >= len(self.apps)
+                ):
+                    raise ValueError(f"{field} do not match the app table")
+                session[field] = AppTimes(self.apps, ids, seconds)
+        return self._intern_session(session)
+
+    def _intern_session(self, session):
+        session.setdefault("applications", {})
+        for field, _, _ in _INTERNED_FIELDS:
+            if field in session:
+                session[field] = AppTimes.from_dict(self.apps, session[field])
+        return session
+
+    def _encode_session(self, session):
+        encoded = dict(session)
+        for field, ids_key, seconds_key in _INTERNED_FIELDS:
+            if field in encoded:
+                app_times = AppTimes.from_dict(self.apps, encoded.pop(field))
+                encoded[ids_key] = pack_array(app_times.ids)
+                encoded[seconds_key] = pack_array(app_times.seconds)
+        return encoded
+
+    def _read_journal(self):
+        if not os.path.exists(self.journal_file):
+            return
+        self._drop_torn_tail()
+        with open(self.journal_file, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    yield int(record["seq"]), record["session"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+    def _drop_torn_tail(self):
+        # A crash mid-append leaves a final line without its newline. Cut it
+        # off so the next append does not get glued onto the broken record.
+        with open(self.journal_file, "rb+") as f:
+            content = f.read()
+            if not content or content.endswith(b"\n"):
+                return
+            f.truncate(content.rfind(b"\n") + 1)
+
+    def append_session(self, session, data):
+        self.data = data
+        self.last_seq += 1
+        record = {"seq": self.last_seq, "session": session}
+        with open(self.journal_file, "a") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._intern_session(session)
+        self.pending += 1
+        self.rollup.add_session(session)
+        if self.pending >= self.compact_every and not self.read_only:
+            self.compact(data)
+
+    def compact(self, data):
+        self.data = data
+        sessions = [self._encode_session(session) for session in data["sessions"]]
+        # Small entries first, so a streaming load knows every app name
+        # before the first session and a cut-off file still has them.
+        snapshot = {"journal_seq": self.last_seq, "apps": self.apps.names}
+        snapshot.update(
+            (key, value) for key, value in data.items() if key != "sessions"
+        )
+        snapshot["sessions"] = sessions
+        write_json_atomic(self.data_file, snapshot)
+        # Safe to drop now: every journal entry is covered by journal_seq.
+        with open(self.journal_file, "w"):
+            pass
+        self.pending = 0
+
+    def rewrite(self, data):
+        # Start a fresh table so names of deleted sessions are dropped
+        self.apps = AppTable()
+        for session in data["sessions"]:
+            self._intern_session(session)
+        self.compact(data)
+        self.rollup.rebuild(data["sessions"])
+        self.read_only = False  # The snapshot was replaced as a whole
+
+    def aggregate(self, start_date=None, end_date=None):
+        return self.rollup.aggregate(start_date, end_date)
+
+
+class DailyRollup:
+    """Per-day totals ({app: seconds}, duration, session count) keyed by date.
+
+    Kept current as sessions are appended and only rebuilt from scratch when
+    the whole history is replaced, so a range query merges one small dict
+    per day instead of re-walking every session.
+    """
+
+    def __init__(self, sessions=()):
+        self.days = {}
+        self.dates = []  # sorted keys of self.days, for range lookups
+        self.undated = {"applications": {}, "duration": 0, "sessions": 0}
+        for session in sessions:
+            self.add_session(session)
+
+    def rebuild(self, sessions):
+        self.__init__(sessions)
+
+    def add_session(self, session):
+        # A session with a timeline counts towards every day it touches
+        for date, applications, duration in session_days(session):
+            if not date:
+                day = self.undated
+            else:
+                day = self.days.get(date)
+                if day is None:
+                    day = {"applications": {}, "duration": 0, "sessions": 0}
+                    self.days[date] = day
+                    bisect.insort(self.dates, date)
+            day["duration"] += duration
+            day["sessions"] += 1
+            day_apps = day["applications"]
+            for app_raw_name, time_spent in applications.items():
+                day_apps[app_raw_name] = day_apps.get(app_raw_name, 0) + time_spent
+
+    def aggregate(self, start_date=None, end_date=None):
+        lo = 0 if start_date is None else bisect.bisect_left(self.dates, start_date)
+        hi = (
+            len(self.dates)
+            if end_date is None
+            else bisect.bisect_right(self.dates, end_date)
+        )
+        days = [self.days[date] for date in self.dates[lo:hi]]
+        if start_date is None and end_date is None:
+            days.append(self.undated)
+        apps = {}
+        total_duration = 0
+        session_count = 0
+        for day in days:
+            total_duration += day["duration"]
+            session_count += day["sessions"]
+            for app_raw_name, seconds in day["applications"].items():
+                apps[app_raw_name] = apps.get(app_raw_name, 0) + seconds
+        return apps, total_duration, session_count
+
+
+class SqliteSessionStore:
+    """Optional SQLite backend with per-application rows indexed on date and app.
+
+    Range statistics become ``SUM ... GROUP BY app`` over the
+    ``(date, app)`` index instead of a Python walk over every session.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            start_time TEXT,
+            end_time TEXT,
+            duration REAL NOT NULL DEFAULT 0,
+            timeline TEXT,
+            titles TEXT
+        );
+        CREATE TABLE IF NOT EXISTS session_apps (
+            session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+            date TEXT NOT NULL,
+            app TEXT NOT NULL,
+            seconds REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS session_days (
+            session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+            date TEXT NOT NULL,
+            duration REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_date ON sessions(date);
+        CREATE INDEX IF NOT EXISTS idx_session_days_date
+            ON session_days(date, duration);
+        CREATE INDEX IF NOT EXISTS idx_session_apps_date_app
+            ON session_apps(date, app, seconds);
+        CREATE INDEX IF NOT EXISTS idx_session_apps_app ON session_apps(app);
+    """
+
+    def __init__(self, db_file):
+        import sqlite3
+
+        self.db_file = db_file
+        # Opened on the Tk thread but first read by the background loader;
+        # access is never concurrent, so the same-thread check is relaxed.
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(sessions)")}
+        if "timeline" not in columns:  # Databases created before timelines
+            self.conn.execute("ALTER TABLE sessions ADD COLUMN timeline TEXT")
+            self.conn.execute(
+                "INSERT INTO session_days (session_id, date, duration) "
+                "SELECT id, date, duration FROM sessions"
+            )
+        if "titles" not in columns:
+            self.conn.execute("ALTER TABLE sessions ADD COLUMN titles TEXT")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def load(self):
+        sessions = {}
+        ordered = []
+        for row in self.conn.execute(
+            "SELECT id, date, start_time, end_time, duration, timeline, titles "
+            "FROM sessions ORDER BY id"
+        ):
+            session = {
+                "date": row[1],
+                "start_time": row[2],
+                "end_time": row[3],
+                "duration": row[4],
+                "applications": {},
+            }
+            if row[5]:
+                session["timeline"] = json.loads(row[5])
+            if row[6]:
+                session["titles"] = json.loads(row[6])
+            sessions[row[0]] = session
+            ordered.append(session)
+        for session_id, app, seconds in self.conn.execute(
+            "SELECT session_id, app, seconds FROM session_apps ORDER BY rowid"
+        ):
+            # Rows of a session split across days are summed back up
+            applications = sessions[session_id]["applications"]
+            applications[app] = applications.get(app, 0) + seconds
+        apps = AppTable()
+        for session in ordered:
+            for field, _, _ in _INTERNED_FIELDS:
+                if field in session:
+                    session[field] = AppTimes.from_dict(apps, session[field])
+        data = {"sessions": ordered}
+        for key, value in self.conn.execute("SELECT key, value FROM settings"):
+            data.setdefault("settings", {})[key] = json.loads(value)
+        return data
+
+    def _insert_session(self, session):
+        date = session.get("date") or ""
+        timeline = session.get("timeline")
+        titles = session.get("titles")
+        cursor = self.conn.execute(
+            "INSERT INTO sessions "
+            "(date, start_time, end_time, duration, timeline, titles) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                date,
+                session.get("start_time"),
+                session.get("end_time"),
+                session.get("duration", 0),
+                json.dumps(timeline) if timeline else None,
+                json.dumps(dict(titles.items())) if titles else None,
+            ),
+        )
+        # Duration and per-application rows are dated by the day the time
+        # was spent on, so sessions crossing midnight are split exactly.
+        days = session_days(session)
+        self.conn.executemany(
+            "INSERT INTO session_days (session_id, date, duration) VALUES (?, ?, ?)",
+            [(cursor.lastrowid, day or "", duration) for day, _, duration in days],
+        )
+        self.conn.executemany(
+            "INSERT INTO session_apps (session_id, date, app, seconds) VALUES (?, ?, ?, ?)",
+            [
+                (cursor.lastrowid, day or "", app, seconds)
+                for day, applications, _ in days
+                for app, seconds in applications.items()
+            ],
+        )
+
+    def append_session(self, session, data=None):
+        with self.conn:
+            self._insert_session(session)
+
+    def rewrite(self, data):
+        with self.conn:
+            self.conn.execute("DELETE FROM session_apps")
+            self.conn.execute("DELETE FROM session_days")
+            self.conn.execute("DELETE FROM sessions")
+            self.conn.execute("DELETE FROM settings")
+            for session in data.get("sessions", []):
+                self._insert_session(session)
+            self.conn.executemany(
+                "INSERT INTO settings (key, value) VALUES (?, ?)",
+                [
+                    (key, json.dumps(value))
+                    for key, value in data.get("settings", {}).items()
+                ],
+            )
+
+    def _range_clause(self, start_date, end_date):
+        clauses, params = [], []
+        if start_date is not None:
+            clauses.append("date >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            clauses.append("date <= ?")
+            params.append(end_date)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    def aggregate(self, start_date=None, end_date=None):
+        where, params = self._range_clause(start_date, end_date)
+        total_duration, session_count = self.conn.execute(
+            "SELECT COALESCE(SUM(duration), 0), COUNT(*) FROM session_days" + where,
+            params,
+        ).fetchone()
+        apps = dict(
+            self.conn.execute(
+                "SELECT app, SUM(seconds) FROM session_apps" + where + " GROUP BY app",
+                params,
+            )
+        )
+        return apps, total_duration, session_count
+
+
+class SessionCheckpoint:
+    """Write-ahead log of the session being tracked, for crash recovery.
+
+    ``begin`` starts a log, ``update`` hands over the running totals and
+    ``finish`` deletes the log once the session has been saved. The callers
+    only copy two dicts onto a queue; a writer thread appends what changed
+    since the previous checkpoint as one JSON line and fsyncs at most every
+    ``fsync_interval`` seconds, so several checkpoints share one sync.
+    ``recover`` turns a log left behind by a crash back into a session.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path, fsync_interval=30.0):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def begin(self, start_ts):
+        self._queue.put(("begin", start_ts))
+
+    def update(self, ts, app_times, title_times=None):
+        self._queue.put(("update", ts, dict(app_times), dict(title_times or {})))
+
+    def finish(self):
+        self._queue.put(("finish",))
+
+    def close(self, timeout=5.0):
+        # Syncs what is pending; a log that was not finished stays for recovery
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        f = None
+        totals = {}
+        synced = True
+        last_sync = time.monotonic()
+        while True:
+            timeout = (
+                None
+                if synced
+                else max(0, last_sync + self.fsync_interval - time.monotonic())
+            )
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            try:
+                if item is self._STOP or item is None or item[0] != "update":
+                    if f is not None and not synced:
+                        f.flush()
+                        os.fsync(f.fileno())
+                    synced = True
+                    last_sync = time.monotonic()
+                if item is self._STOP:
+                    if f is not None:
+                        f.close()
+                    return
+                if item is None:
+                    continue
+                if item[0] == "begin":
+                    if f is not None:
+                        f.close()
+                    f = open(self.path, "w")
+                    totals = {"apps": {}, "titles": {}}
+                    f.write(json.dumps({"start": item[1]}) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                elif item[0] == "update" and f is not None:
+                    record = {"ts": item[1]}
+                    for key, current in (("apps", item[2]), ("titles", item[3])):
+                        previous = totals[key]
+                        record[key] = {
+                            name: seconds - previous.get(name, 0)
+                            for name, seconds in current.items()
+                            if seconds != previous.get(name, 0)
+                        }
+                        totals[key] = current
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                    f.flush()
+                    synced = False
+                    if time.monotonic() - last_sync >= self.fsync_interval:
+                        os.fsync(f.fileno())
+                        synced = True
+                        last_sync = time.monotonic()
+                elif item[0] == "finish" and f is not None:
+                    f.close()
+                    f = None
+                    os.remove(self.path)
+            except OSError as e:
+                print(f"Session checkpoint failed: {e}")
+
+    @staticmethod
+    def recover(path):
+        """The session recorded in an unfinished log, or None.
+
+        The session ends at the last checkpoint that reached the disk.
+        """
+        try:
+            f = open(path, "r")
+        except FileNotFoundError:
+            return None
+        start_ts = end_ts = None
+        apps, titles = {}, {}
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    if "start" in record:
+                        start_ts = end_ts = record["start"]
+                        continue
+                    for key, totals in (("apps", apps), ("titles", titles)):
+                        for name, seconds in record.get(key, {}).items():
+                            totals[name] = totals.get(name, 0) + seconds
+                    end_ts = record["ts"]
+                except (ValueError, TypeError, KeyError, AttributeError):
+                    break  # Torn last line
+        if start_ts is None or not apps:
+            return None
+        return make_session(start_ts, end_ts, apps, titles)
+
+
+def import_json_to_sqlite(json_file, db_file):
+    # One-time migration from the productivity_data.json layout (plus any
+    # journal entries not yet compacted into it).
+    data = SessionJournal(json_file).load()
+    store = SqliteSessionStore(db_file)
+    store.rewrite(data)
+    return store, data
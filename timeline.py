@@ -0,0 +1,218 @@
+import base64
+import datetime
+import sys
+import time
+from array import array
+
+# Offsets and durations are int32 milliseconds relative to the session
+# start, which covers sessions of up to ~24 days.
+_MAX_MS = 2**31 - 1
+
+
+def pack_array(values):
+    # Little-endian base64 text for an array, as stored in the JSON files
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def unpack_array(typecode, text):
+    values = array(typecode)
+    values.frombytes(base64.b64decode(text))
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class Timeline:
+    """Focus intervals of one session, stored column-wise.
+
+    Each interval is ``(offset, app_id, duration)``: milliseconds since the
+    session start, an index into the session's interned app table, and its
+    length in milliseconds. Adjacent intervals of the same app are merged as
+    they are added, so the periodic live flushes do not fragment the log.
+    """
+
+    def __init__(self, base_ts):
+        self.base_ts = base_ts
+        self.end_ts = base_ts
+        self.apps = []  # app_id -> raw name
+        self.app_ids = {}  # raw name -> app_id
+        self.offsets = array("i")
+        self.ids = array("I")
+        self.durations = array("i")
+
+    def intern(self, app_raw_name):
+        app_id = self.app_ids.get(app_raw_name)
+        if app_id is None:
+            app_id = self.app_ids[app_raw_name] = len(self.apps)
+            self.apps.append(app_raw_name)
+        return app_id
+
+    def add(self, app_raw_name, start_ts, end_ts):
+        start = min(int(round((start_ts - self.base_ts) * 1000)), _MAX_MS)
+        end = min(int(round((end_ts - self.base_ts) * 1000)), _MAX_MS)
+        self.end_ts = max(self.end_ts, end_ts)
+        if end <= start:
+            return
+        app_id = self.intern(app_raw_name)
+        if (
+            self.ids
+            and self.ids[-1] == app_id
+            and self.offsets[-1] + self.durations[-1] == start
+        ):
+            self.durations[-1] += end - start
+            return
+        self.offsets.append(start)
+        self.ids.append(app_id)
+        self.durations.append(end - start)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def intervals(self):
+        # (app, start_ts, end_ts) in recording order
+        for offset, app_id, duration in zip(self.offsets, self.ids, self.durations):
+            start_ts = self.base_ts + offset / 1000
+            yield self.apps[app_id], start_ts, start_ts + duration / 1000
+
+    def totals(self):
+        seconds = [0] * len(self.apps)
+        for app_id, duration in zip(self.ids, self.durations):
+            seconds[app_id] += duration
+        return {app: total / 1000 for app, total in zip(self.apps, seconds) if total}
+
+    def split_by_day(self):
+        """{date: (applications, duration)} with intervals cut at local midnight.
+
+        ``duration`` is the part of the whole session (start to end, tracked
+        or not) that falls on that date.
+        """
+        days = {}
+
+        def day_entry(date_str):
+            entry = days.get(date_str)
+            if entry is None:
+                entry = days[date_str] = [{}, 0.0]
+            return entry
+
+        for date_str, start_ts, end_ts, app in _day_pieces(self.intervals()):
+            apps = day_entry(date_str)[0]
+            apps[app] = apps.get(app, 0) + (end_ts - start_ts)
+        for date_str, start_ts, end_ts, _ in _day_pieces(
+            [(None, self.base_ts, self.end_ts)]
+        ):
+            day_entry(date_str)[1] += end_ts - start_ts
+        return {date_str: tuple(entry) for date_str, entry in days.items()}
+
+    def hourly_histogram(self):
+        """Seconds of focus per local hour of day (24 bins), binned with numpy.
+
+        Hours are taken in the UTC offset in effect at the session start.
+
+        Intervals spanning several hours are split across them exactly: the
+        partial first and last hours are added with ``bincount`` and the whole
+        hours in between through a cumulative-sum difference array.
+        """
+        import numpy as np
+
+        if not len(self):
+            return np.zeros(24)
+        local_base = self.base_ts + time.localtime(self.base_ts).tm_gmtoff
+        day_start = local_base - local_base % 86400
+        starts = (
+            local_base - day_start + np.frombuffer(self.offsets, dtype=np.int32) / 1000
+        )
+        ends = starts + np.frombuffer(self.durations, dtype=np.int32) / 1000
+        first_hour = (starts // 3600).astype(np.int64)
+        last_hour = (np.ceil(ends / 3600) - 1).astype(np.int64)
+        last_hour = np.maximum(last_hour, first_hour)
+        n_hours = int(last_hour.max()) + 2
+
+        same = first_hour == last_hour
+        first_part = np.where(same, ends - starts, (first_hour + 1) * 3600 - starts)
+        histogram = np.bincount(first_hour, weights=first_part, minlength=n_hours)
+        spans = ~same
+        histogram += np.bincount(
+            last_hour[spans],
+            weights=ends[spans] - last_hour[spans] * 3600,
+            minlength=n_hours,
+        )
+        whole = np.zeros(n_hours + 1)
+        np.add.at(whole, first_hour[spans] + 1, 3600.0)
+        np.add.at(whole, last_hour[spans], -3600.0)
+        histogram += np.cumsum(whole)[:n_hours]
+        return np.bincount(np.arange(n_hours) % 24, weights=histogram, minlength=24)
+
+    def to_dict(self):
+        return {
+            "base": self.base_ts,
+            "end": self.end_ts,
+            "apps": list(self.apps),
+            "offsets": pack_array(self.offsets),
+            "app_ids": pack_array(self.ids),
+            "durations": pack_array(self.durations),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        timeline = cls(data["base"])
+        timeline.end_ts = data.get("end", data["base"])
+        timeline.apps = list(data["apps"])
+        timeline.app_ids = {app: i for i, app in enumerate(timeline.apps)}
+        timeline.offsets = unpack_array("i", data["offsets"])
+        timeline.ids = unpack_array("I", data["app_ids"])
+        timeline.durations = unpack_array("i", data["durations"])
+        return timeline
+
+
+def _day_pieces(intervals):
+    # (date, start_ts, end_ts, app) with every interval cut at local midnight.
+    # Intervals are mostly on the same day as the previous one, so the day's
+    # bounds are only recomputed when an interval leaves them.
+    day_start = day_end = date_str = None
+    for app, start_ts, end_ts in intervals:
+        while start_ts < end_ts:
+            if day_start is None or not day_start <= start_ts < day_end:
+                day = datetime.datetime.fromtimestamp(start_ts).date()
+                day_start = datetime.datetime.combine(day, datetime.time()).timestamp()
+                day_end = datetime.datetime.combine(
+                    day + datetime.timedelta(days=1), datetime.time()
+                ).timestamp()
+                date_str = day.strftime("%Y-%m-%d")
+            piece_end = min(end_ts, day_end)
+            yield date_str, start_ts, piece_end, app
+            start_ts = piece_end
+
+
+def session_days(session):
+    """(date, applications, duration) pieces a session contributes to.
+
+    Sessions with a timeline are split at local midnight; others count
+    entirely towards their start date, as before.
+    """
+    timeline = session.get("timeline")
+    if timeline:
+        days = Timeline.from_dict(timeline).split_by_day()
+        return [
+            (date_str, apps, duration) for date_str, (apps, duration) in days.items()
+        ]
+    return [
+        (
+            session.get("date"),
+            session.get("applications", {}),
+            session.get("duration", 0),
+        )
+    ]
+
+
+def hourly_histogram(sessions):
+    # Focus seconds per hour of day over all sessions that carry a timeline
+    import numpy as np
+
+    histogram = np.zeros(24)
+    for session in sessions:
+        if session.get("timeline"):
+            histogram += Timeline.from_dict(session["timeline"]).hourly_histogram()
+    return histogram
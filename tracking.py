@@ -0,0 +1,655 @@
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class ProcessNameCache:
+    """Bounded cache of process names keyed on ``(pid, create_time)``.
+
+    A pid is only looked up again after ``revalidate_after`` seconds, and
+    then only its creation time is checked; if the process died or the pid
+    was reused the entry is evicted and resolved afresh. Access-denied
+    results are cached too, so a protected system window costs one failed
+    lookup per process lifetime instead of one per sample.
+    """
+
+    _DENIED = object()
+
+    def __init__(
+        self,
+        resolve_name,
+        identity=None,
+        maxsize=256,
+        revalidate_after=5.0,
+        clock=time.monotonic,
+    ):
+        self.resolve_name = resolve_name
+        self.identity = identity
+        self.maxsize = maxsize
+        self.revalidate_after = revalidate_after
+        self.clock = clock
+        self._entries = OrderedDict()  # pid -> [create_time, name, checked_at]
+
+    def _identity(self, pid):
+        if self.identity is None:
+            return None
+        try:
+            return self.identity(pid)
+        except PermissionError:
+            return None
+
+    def _result(self, entry):
+        if entry[1] is self._DENIED:
+            raise PermissionError(entry[0])
+        return entry[1]
+
+    def get(self, pid):
+        now = self.clock()
+        entry = self._entries.get(pid)
+        if entry is not None:
+            if now - entry[2] < self.revalidate_after:
+                self._entries.move_to_end(pid)
+                return self._result(entry)
+            try:
+                create_time = self._identity(pid)
+            except ProcessLookupError:
+                del self._entries[pid]
+                raise
+            if create_time == entry[0]:
+                entry[2] = now
+                self._entries.move_to_end(pid)
+                return self._result(entry)
+            del self._entries[pid]  # pid was reused by a new process
+
+        create_time = self._identity(pid)
+        try:
+            name = self.resolve_name(pid)
+        except PermissionError:
+            name = self._DENIED
+        self._entries[pid] = [create_time, name, now]
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return self._result(self._entries[pid])
+
+
+class WindowProbe:
+    """Reads the foreground window and resolves it to an application name.
+
+    Backends implement ``foreground()`` -> ``(title, pid)`` and
+    ``process_name(pid)``; the latter raises ``ProcessLookupError`` for a
+    process that has ended and ``PermissionError`` when access is denied.
+    """
+
+    def foreground(self):
+        raise NotImplementedError
+
+    def process_name(self, pid):
+        raise NotImplementedError
+
+    def process_create_time(self, pid):
+        # Identity used to detect pid reuse; None disables the check.
+        return None
+
+    @property
+    def name_cache(self):
+        cache = self.__dict__.get("_process_name_cache")
+        if cache is None:
+            cache = ProcessNameCache(self.process_name, self.process_create_time)
+            self._process_name_cache = cache
+        return cache
+
+    def read_app(self):
+        return self._app_name(*self.foreground())
+
+    def read_capture(self):
+        # (title, process name or None); the process name lets titles be
+        # normalized to an application. Cached, so cheap on every sample.
+        raw_title, pid = self.foreground()
+        try:
+            process_name = self.name_cache.get(pid) if pid and pid > 0 else None
+        except Exception:
+            process_name = None
+        return self._app_name(raw_title, pid), process_name
+
+    def _app_name(self, raw_title, pid):
+        # Unknown/empty window titles fall back to the owning process name
+        if raw_title and raw_title.strip() and raw_title.strip().lower() != "unknown":
+            return raw_title  # Use the window title if it's valid
+
+        try:
+            if not pid or pid <= 0:
+                return "Unknown (System Window/No PID)"
+            p_name = self.name_cache.get(pid)  # e.g., "chrome.exe"
+            if p_name and p_name.strip():
+                return p_name
+            return f"Unnamed Process (PID: {pid})"
+        except ProcessLookupError:
+            return "Unknown (Process Ended)"
+        except PermissionError:
+            return "Unknown (Access Denied to Process Info)"
+        except Exception:  # Catch other backend errors
+            return "Unknown (Error Getting Process Info)"
+
+
+class Win32WindowProbe(WindowProbe):
+    def __init__(self):
+        import psutil
+        import win32gui
+        import win32process
+
+        self._psutil = psutil
+        self._win32gui = win32gui
+        self._win32process = win32process
+
+    def foreground(self):
+        window = self._win32gui.GetForegroundWindow()
+        raw_title = self._win32gui.GetWindowText(window)
+        try:
+            # GetWindowThreadProcessId returns (threadId, processId)
+            _, pid = self._win32process.GetWindowThreadProcessId(window)
+        except Exception:
+            pid = 0
+        return raw_title, pid
+
+    def process_name(self, pid):
+        try:
+            return self._psutil.Process(pid).name()
+        except self._psutil.NoSuchProcess:
+            raise ProcessLookupError(pid)
+        except self._psutil.AccessDenied:
+            raise PermissionError(pid)
+
+    def process_create_time(self, pid):
+        try:
+            return self._psutil.Process(pid).create_time()
+        except self._psutil.NoSuchProcess:
+            raise ProcessLookupError(pid)
+        except self._psutil.AccessDenied:
+            raise PermissionError(pid)
+
+
+class X11WindowProbe(WindowProbe):
+    # Uses xprop and the EWMH _NET_ACTIVE_WINDOW / _NET_WM_NAME / _NET_WM_PID
+    # properties, so it needs no Python X bindings.
+
+    def __init__(self, xprop="xprop", timeout=1.0):
+        self.xprop = xprop
+        self.timeout = timeout
+
+    @staticmethod
+    def is_supported():
+        return bool(os.environ.get("DISPLAY")) and shutil.which("xprop") is not None
+
+    def _xprop(self, *args):
+        import subprocess
+
+        return subprocess.run(
+            [self.xprop, *args],
+            capture_output=True,
+            text=True,
+            check=False,
+            encoding="utf-8",
+            errors="replace",
+            timeout=self.timeout,
+        ).stdout
+
+    @staticmethod
+    def _property_value(output, name):
+        for line in output.splitlines():
+            if line.startswith(name) and "=" in line:
+                return line.split("=", 1)[1].strip()
+        return None
+
+    def foreground(self):
+        active = self._property_value(
+            self._xprop("-root", "_NET_ACTIVE_WINDOW"), "_NET_ACTIVE_WINDOW"
+        )
+        # e.g. "window id # 0x3a00007"
+        window_id = active.split()[-1] if active else ""
+        if not window_id or int(window_id, 16) == 0:
+            return "", 0
+        output = self._xprop("-id", window_id, "_NET_WM_NAME", "_NET_WM_PID")
+        title = self._property_value(output, "_NET_WM_NAME") or ""
+        if title.startswith('"') and title.endswith('"'):
+            title = title[1:-1].replace('\\"', '"')
+        pid = self._property_value(output, "_NET_WM_PID")
+        try:
+            pid = int(pid)
+        except (TypeError, ValueError):
+            pid = 0
+        return title, pid
+
+    def process_name(self, pid):
+        try:
+            with open(f"/proc/{pid}/comm", "r") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            raise ProcessLookupError(pid)
+
+    def process_create_time(self, pid):
+        try:
+            with open(f"/proc/{pid}/stat", "r") as f:
+                stat = f.read()
+        except FileNotFoundError:
+            raise ProcessLookupError(pid)
+        # Field 22 (starttime); the command name in field 2 may contain spaces.
+        return int(stat.rsplit(")", 1)[1].split()[19])
+
+
+class ReplayWindowProbe(WindowProbe):
+    """Scripted probe for headless runs and benchmarks.
+
+    ``script`` is a list of ``[title, pid]`` samples returned in order (the
+    last one repeats once exhausted, or the script restarts with ``loop``).
+    ``process_names`` maps pid to name; a value of ``None`` means access
+    denied and a missing pid means the process has ended.
+    """
+
+    def __init__(self, script, process_names=None, loop=False):
+        self.script = [tuple(sample) for sample in script]
+        self.process_names = {
+            int(pid): name for pid, name in (process_names or {}).items()
+        }
+        self.loop = loop
+        self.position = 0
+
+    @classmethod
+    def from_file(cls, path, loop=False):
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(data["samples"], data.get("process_names"), loop=loop)
+
+    def foreground(self):
+        if not self.script:
+            return "", 0
+        if self.position >= len(self.script):
+            self.position = 0 if self.loop else len(self.script) - 1
+        sample = self.script[self.position]
+        self.position += 1
+        return sample
+
+    def process_name(self, pid):
+        if pid not in self.process_names:
+            raise ProcessLookupError(pid)
+        name = self.process_names[pid]
+        if name is None:
+            raise PermissionError(pid)
+        return name
+
+
+def create_window_probe():
+    if sys.platform == "win32":
+        return Win32WindowProbe()
+    if X11WindowProbe.is_supported():
+        return X11WindowProbe()
+    raise RuntimeError(
+        "No foreground window probe is available on this platform "
+        "(Windows, or X11 with xprop installed, is required)."
+    )
+
+
+class StateMailbox:
+    """Latest-value handoff from a worker thread to the Tk thread.
+
+    The worker publishes changed fields; the Tk-side poller takes everything
+    published since its previous frame in one go. Values overwritten before
+    they were taken are simply dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def publish(self, **changes):
+        with self._lock:
+            self._pending.update(changes)
+
+    def take(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+
+class AppTimeAccumulator:
+    """Attributes elapsed time to the foreground application.
+
+    Time is credited to the previous application at the exact timestamp of
+    each switch. ``flush`` credits the in-progress interval up to "now" so
+    live views stay current between switches.
+    """
+
+    def __init__(self, on_interval=None, on_span=None):
+        self.app_times = {}
+        self.title_times = {}  # Raw window titles, when apps are normalized
+        self.current_app = ""
+        self.current_title = ""
+        self.last_ts = None
+        self.on_interval = on_interval
+        self.on_span = on_span  # Optional callable(app, start_ts, end_ts)
+        self._lock = threading.Lock()
+
+    def reset(self, start_ts):
+        with self._lock:
+            self.app_times = {}
+            self.title_times = {}
+            self.current_app = ""
+            self.current_title = ""
+            self.last_ts = start_ts
+
+    def _credit(self, ts):
+        if self.current_app and self.last_ts is not None and ts > self.last_ts:
+            interval = ts - self.last_ts
+            self.app_times[self.current_app] = (
+                self.app_times.get(self.current_app, 0) + interval
+            )
+            self.title_times[self.current_title] = (
+                self.title_times.get(self.current_title, 0) + interval
+            )
+            if self.on_interval:
+                # Focus keywords are matched against the raw window title
+                self.on_interval(self.current_title, interval)
+            if self.on_span:
+                self.on_span(self.current_app, self.last_ts, ts)
+        self.last_ts = ts if self.last_ts is None else max(self.last_ts, ts)
+
+    def switch(self, app_raw_name, ts, raw_title=None):
+        with self._lock:
+            self._credit(ts)
+            self.current_app = app_raw_name
+            self.current_title = app_raw_name if raw_title is None else raw_title
+
+    def flush(self, ts):
+        with self._lock:
+            self._credit(ts)
+
+
+class ForegroundSource:
+    """Reports changes of the foreground application.
+
+    ``run`` blocks in the tracking thread and calls ``on_change(app, ts)``
+    whenever the foreground application changes, until ``stop_event`` is set.
+    ``app`` is a title or a ``(title, process name)`` pair.
+    """
+
+    def run(self, on_change, stop_event, on_error=None):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class PollingForegroundSource(ForegroundSource):
+    # The original behavior: ask the probe once per interval.
+    def __init__(self, probe, interval=1.0):
+        self.probe = probe
+        self.interval = interval
+
+    def run(self, on_change, stop_event, on_error=None):
+        last_app = None
+        while not stop_event.is_set():
+            try:
+                ts = time.time()
+                app = self.probe()
+                if app != last_app:
+                    on_change(app, ts)
+                    last_app = app
+            except Exception as e:
+                if on_error:
+                    on_error(e)
+            stop_event.wait(self.interval)
+
+
+class WinEventForegroundSource(ForegroundSource):
+    """Event-driven source using SetWinEventHook on Windows.
+
+    The thread sleeps in GetMessage and only wakes when the foreground window
+    changes or the foreground window's title changes (e.g. a browser tab
+    switch), so idle tracking costs no polling wakeups.
+    """
+
+    EVENT_SYSTEM_FOREGROUND = 0x0003
+    EVENT_OBJECT_NAMECHANGE = 0x800C
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    OBJID_WINDOW = 0
+    WM_QUIT = 0x0012
+    PM_NOREMOVE = 0x0000
+
+    def __init__(self, probe):
+        self.probe = probe
+        self._thread_id = None
+        self._ready = threading.Event()  # Set once stop() can reach the loop
+
+    @staticmethod
+    def is_supported():
+        try:
+            import ctypes
+
+            return hasattr(ctypes, "windll")
+        except ImportError:
+            return False
+
+    def run(self, on_change, stop_event, on_error=None):
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        kernel32 = ctypes.windll.kernel32
+        WinEventProc = ctypes.WINFUNCTYPE(
+            None,
+            wintypes.HANDLE,
+            wintypes.DWORD,
+            wintypes.HWND,
+            wintypes.LONG,
+            wintypes.LONG,
+            wintypes.DWORD,
+            wintypes.DWORD,
+        )
+        # Handles are pointer-sized; undeclared, ctypes would pass and return
+        # them as C ints and truncate them.
+        LPMSG = ctypes.POINTER(wintypes.MSG)
+        user32.SetWinEventHook.argtypes = [
+            wintypes.DWORD,
+            wintypes.DWORD,
+            wintypes.HMODULE,
+            WinEventProc,
+            wintypes.DWORD,
+            wintypes.DWORD,
+            wintypes.DWORD,
+        ]
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.UnhookWinEvent.argtypes = [wintypes.HANDLE]
+        user32.UnhookWinEvent.restype = wintypes.BOOL
+        user32.GetMessageW.argtypes = [
+            LPMSG,
+            wintypes.HWND,
+            wintypes.UINT,
+            wintypes.UINT,
+        ]
+        user32.GetMessageW.restype = wintypes.BOOL
+        user32.PeekMessageW.argtypes = [
+            LPMSG,
+            wintypes.HWND,
+            wintypes.UINT,
+            wintypes.UINT,
+            wintypes.UINT,
+        ]
+        user32.PeekMessageW.restype = wintypes.BOOL
+        user32.PostThreadMessageW.argtypes = [
+            wintypes.DWORD,
+            wintypes.UINT,
+            wintypes.WPARAM,
+            wintypes.LPARAM,
+        ]
+        user32.PostThreadMessageW.restype = wintypes.BOOL
+        user32.GetForegroundWindow.restype = wintypes.HWND
+        last_app = [None]
+
+        def report(ts):
+            try:
+                app = self.probe()
+                if app != last_app[0]:
+                    on_change(app, ts)
+                    last_app[0] = app
+            except Exception as e:
+                if on_error:
+                    on_error(e)
+
+        def callback(hook, event, hwnd, id_object, id_child, thread_id, event_ms):
+            if event == self.EVENT_OBJECT_NAMECHANGE and (
+                id_object != self.OBJID_WINDOW or hwnd != user32.GetForegroundWindow()
+            ):
+                return
+            # event_ms is GetTickCount() at the moment of the switch.
+            lag = (kernel32.GetTickCount() - event_ms) & 0xFFFFFFFF
+            report(time.time() - min(lag, 5000) / 1000.0)
+
+        proc = WinEventProc(callback)  # keep a reference for the hook lifetime
+        msg = wintypes.MSG()
+        # Create this thread's message queue before stop() can post WM_QUIT to it.
+        user32.PeekMessageW(ctypes.byref(msg), None, 0, 0, self.PM_NOREMOVE)
+        thread_id = self._thread_id = kernel32.GetCurrentThreadId()
+        self._ready.set()
+        hooks = [
+            user32.SetWinEventHook(
+                event, event, None, proc, 0, 0, self.WINEVENT_OUTOFCONTEXT
+            )
+            for event in (self.EVENT_SYSTEM_FOREGROUND, self.EVENT_OBJECT_NAMECHANGE)
+        ]
+        try:
+            # Stopped while the hooks were being installed
+            if stop_event.is_set():
+                return
+            report(time.time())
+            while not stop_event.is_set():
+                if user32.GetMessageW(ctypes.byref(msg), None, 0, 0) <= 0:
+                    break
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            for hook in hooks:
+                if hook:
+                    user32.UnhookWinEvent(hook)
+            # A later run may already have replaced these
+            if self._thread_id == thread_id:
+                self._thread_id = None
+                self._ready.clear()
+
+    def stop(self, timeout=1.0):
+        # The loop checks stop_event once its hooks are in, so a stop that
+        # comes before that still ends it; waiting covers the thread id.
+        self._ready.wait(timeout)
+        if self._thread_id:
+            import ctypes
+
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+
+
+class FakeForegroundSource(ForegroundSource):
+    # Replays scripted (timestamp, app) switches; used to drive the tracker
+    # without a desktop session.
+    def __init__(self, events):
+        self.events = list(events)
+
+    def run(self, on_change, stop_event, on_error=None):
+        for ts, app in self.events:
+            if stop_event.is_set():
+                break
+            on_change(app, ts)
+
+
+def create_foreground_source(probe, event_driven=True):
+    # Focus-change events are only available for the Windows probe.
+    if (
+        event_driven
+        and isinstance(probe, Win32WindowProbe)
+        and WinEventForegroundSource.is_supported()
+    ):
+        return WinEventForegroundSource(probe.read_capture)
+    return PollingForegroundSource(probe.read_capture)
+
+
+class TrackerEngine:
+    """Tracking core with no Tk dependency.
+
+    Runs the foreground source in a daemon thread and accumulates per-app
+    time. With a ``normalizer(title, process_name)`` time is kept per
+    canonical application, and per raw title alongside. ``on_change(app, ts,
+    raw_title)`` and ``on_error(exc)`` are called from the tracking thread.
+    """
+
+    def __init__(
+        self,
+        probe=None,
+        source=None,
+        on_interval=None,
+        on_change=None,
+        on_error=None,
+        on_span=None,
+        normalizer=None,
+    ):
+        self.probe = probe
+        self.source = source
+        self.normalizer = normalizer
+        self.on_change = on_change
+        self.on_error = on_error
+        self.activity = AppTimeAccumulator(on_interval=on_interval, on_span=on_span)
+        self.start_time = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def app_times(self):
+        return self.activity.app_times
+
+    @property
+    def title_times(self):
+        return self.activity.title_times
+
+    @property
+    def current_app(self):
+        return self.activity.current_app
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, start_ts=None):
+        if self.source is None:
+            if self.probe is None:
+                self.probe = create_window_probe()
+            self.source = create_foreground_source(self.probe)
+        self.start_time = start_ts if start_ts is not None else time.time()
+        self.activity.reset(self.start_time)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        self.source.run(self._handle_change, self._stop_event, self.on_error)
+
+    def _handle_change(self, capture, ts):
+        raw_title, process_name = (
+            (capture, None) if isinstance(capture, str) else capture
+        )
+        normalizer = self.normalizer
+        app = normalizer(raw_title, process_name) if normalizer else raw_title
+        self.activity.switch(app, ts, raw_title)
+        if self.on_change:
+            self.on_change(app, ts, raw_title)
+
+    def flush(self, ts=None):
+        self.activity.flush(ts if ts is not None else time.time())
+
+    def stop(self, end_ts=None, timeout=1.5):
+        # Ensure the last tracked application's time is recorded
+        self.flush(end_ts)
+        self._stop_event.set()
+        self.source.stop()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        return self.activity.app_times.copy()
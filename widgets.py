@@ -0,0 +1,155 @@
+import tkinter as tk
+
+
+class KeyedTreeview:
+    """Keeps a ttk.Treeview in sync with a keyed, ordered list of rows.
+
+    Each row key (e.g. an application name) owns one Treeview item. An
+    update only touches cells whose values changed and moves only the rows
+    whose rank changed, instead of deleting and reinserting every row.
+    Rows may carry Treeview tags as a third element, e.g. to highlight them.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.iids = {}  # key -> Treeview item id
+        self.values = {}  # key -> tuple of displayed values
+        self.tags = {}  # key -> tuple of item tags
+        self.order = []  # keys in current display order
+
+    def update(self, rows):
+        # rows: iterable of (key, values) or (key, values, tags) in the
+        # desired display order
+        rows = [
+            (row[0], tuple(row[1]), tuple(row[2]) if len(row) > 2 else ())
+            for row in rows
+        ]
+        wanted = {key for key, _, _ in rows}
+
+        for key in [key for key in self.order if key not in wanted]:
+            self.tree.delete(self.iids.pop(key))
+            del self.values[key]
+            del self.tags[key]
+        self.order = [key for key in self.order if key in wanted]
+
+        for index, (key, values, tags) in enumerate(rows):
+            iid = self.iids.get(key)
+            if iid is None:
+                self.iids[key] = self.tree.insert("", index, values=values, tags=tags)
+                self.values[key] = values
+                self.tags[key] = tags
+                self.order.insert(index, key)
+                continue
+            if self.values[key] != values:
+                self.tree.item(iid, values=values)
+                self.values[key] = values
+            if self.tags[key] != tags:
+                self.tree.item(iid, tags=tags)
+                self.tags[key] = tags
+            if self.order[index] != key:
+                # Rows only ever move towards their target rank, so a row
+                # that climbed (the usual case for the current app) is a
+                # single move and everything below it shifts by itself.
+                self.tree.move(iid, "", index)
+                self.order.remove(key)
+                self.order.insert(index, key)
+
+    def clear(self):
+        self.update([])
+
+
+class CanvasBarChart:
+    """Top-N horizontal bar chart drawn directly on a tk.Canvas.
+
+    The label, bar and value items are created once and only their
+    coordinates/text change on update, like the monitor's progress bar.
+    It has the same pack/update/destroy interface as the matplotlib view
+    but needs nothing beyond Tk.
+    """
+
+    LABEL_WIDTH = 78
+    VALUE_WIDTH = 34
+
+    def __init__(self, master, theme, top_n=3, height=110):
+        self.top_n = top_n
+        self.canvas = tk.Canvas(
+            master, height=height, bg=theme["bg"], highlightthickness=0
+        )
+        font = ("Arial", 7)
+        self.rows = [
+            (
+                self.canvas.create_text(
+                    2, 0, anchor="w", text="", fill=theme["fg"], font=font
+                ),
+                self.canvas.create_rectangle(
+                    0, 0, 0, 0, fill=theme["chart"], outline=""
+                ),
+                self.canvas.create_text(
+                    0, 0, anchor="w", text="", fill=theme["fg"], font=font
+                ),
+            )
+            for _ in range(top_n)
+        ]
+        self._data = ([], [])
+        self._drawn = None
+        self.canvas.bind("<Configure>", lambda event: self._layout())
+
+    @staticmethod
+    def _format_seconds(seconds):
+        if seconds < 60:
+            return f"{int(seconds)}s"
+        if seconds < 3600:
+            return f"{int(seconds // 60)}m"
+        return f"{seconds / 3600:.1f}h"
+
+    def update(self, labels, sizes):
+        data = (list(labels), [round(size, 1) for size in sizes])
+        if data == self._data:
+            return False
+        self._data = data
+        self._layout()
+        return True
+
+    def _layout(self):
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            return  # Not mapped yet; <Configure> will call back
+        if (width, height, self._data) == self._drawn:
+            return
+        self._drawn = (width, height, self._data)
+        labels, sizes = self._data
+        row_height = height / self.top_n
+        bar_left = self.LABEL_WIDTH
+        bar_span = max(width - bar_left - self.VALUE_WIDTH, 1)
+        largest = max(sizes) if sizes else 0
+        for index, (label_id, bar_id, value_id) in enumerate(self.rows):
+            center = row_height * index + row_height / 2
+            if index >= len(sizes):
+                self.canvas.itemconfig(label_id, text="")
+                self.canvas.itemconfig(value_id, text="")
+                self.canvas.coords(bar_id, 0, 0, 0, 0)
+                continue
+            bar_right = bar_left + (
+                bar_span * sizes[index] / largest if largest > 0 else 0
+            )
+            self.canvas.coords(label_id, 2, center)
+            self.canvas.itemconfig(label_id, text=labels[index])
+            self.canvas.coords(
+                bar_id,
+                bar_left,
+                center - row_height * 0.3,
+                bar_right,
+                center + row_height * 0.3,
+            )
+            self.canvas.coords(value_id, bar_right + 3, center)
+            self.canvas.itemconfig(value_id, text=self._format_seconds(sizes[index]))
+
+    def pack(self, **kwargs):
+        self.canvas.pack(**kwargs)
+
+    def pack_forget(self):
+        self.canvas.pack_forget()
+
+    def destroy(self):
+        self.canvas.destroy()